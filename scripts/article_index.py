@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+文章索引
+按相对路径记录文章及其引用图片的 mtime/size/inode 与摘要，文件状态未变化时无需重新读取和计算哈希
+"""
+
+import json
+import os
+from pathlib import Path
+
+
+def stat_key(path):
+    """文件状态指纹：(mtime_ns, size, inode)"""
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+
+class ArticleIndex:
+    """持久化的文章索引"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self.entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def lookup(self, key, md_file):
+        """文章及其依赖的文件状态都未变化时返回缓存的信息，否则返回 None"""
+        entry = self.entries.get(key)
+        try:
+            if entry and entry['stat'] == stat_key(md_file) and all(
+                stat_key(Path(md_file).parent / dep) == dep_stat for dep, dep_stat in entry['deps'].items()
+            ):
+                self.hits += 1
+                return entry['info']
+        except OSError:
+            pass
+        self.misses += 1
+        return None
+
+    def store(self, key, md_file, info, deps):
+        """记录文章信息及文件状态，deps 为引用图片的相对路径"""
+        article_dir = Path(md_file).parent
+        self.entries[key] = {
+            'stat': stat_key(md_file),
+            'deps': {dep: stat_key(article_dir / dep) for dep in deps},
+            'info': info
+        }
+        self._dirty = True
+
+    def prune(self, keep_keys):
+        """移除已不存在的文章"""
+        for key in set(self.entries) - set(keep_keys):
+            del self.entries[key]
+            self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+异步发布客户端
+WeChatPublisher 的 asyncio 版本，基于 aiohttp（可选依赖：uv sync --extra async），
+单个进程内流水线化大量图片上传和草稿创建，不需要为阻塞的 requests 调用开线程：
+
+- access_token 刷新为 single-flight：并发的协程共用同一次刷新
+- 每个接口一个信号量限制同时进行的请求数，令牌桶限流与同步版共用 rate_limit 的配置
+- 请求编码、响应检查和重试规则与同步版共用 wechat_api；渲染、各类缓存、长度拆分、发布记录和运行报告复用同步发布器，
+  CPU 密集的渲染、图片压缩和 token 文件锁放到线程池中执行，不阻塞事件循环
+
+    uv run python scripts/async_publisher.py [--dry-run [DIR]]
+"""
+
+import asyncio
+import functools
+import os
+import time
+from pathlib import Path
+
+try:
+    import aiohttp
+except ImportError:  # 可选依赖，离线演练不需要
+    aiohttp = None
+
+from hashing import file_digest
+from image_prep import THUMB_MAX_BYTES
+from multipart import MultipartEncoder
+from rate_limit import parse_rates
+from retry import FATAL, RETRYABLE, TOKEN_EXPIRED, UNCERTAIN, WeChatAPIError, classify_transport_error
+from wechat_api import (
+    api_url, can_reconcile, check_result, draft_lookup_body, encode_request, match_created_draft, retry_delay
+)
+from wechat_publisher import (
+    DraftBatches, WeChatPublisher, finish_run, load_articles, open_state, parse_args, record_outcome, sort_articles
+)
+
+# 每个接口同时进行的请求数，未列出的接口使用 DEFAULT_CONCURRENCY
+DEFAULT_CONCURRENCY = 4
+ENDPOINT_CONCURRENCY = {
+    'media/uploadimg': 16,
+}
+
+CLIENT_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError) if aiohttp else (asyncio.TimeoutError,)
+# 建立连接阶段的失败，请求确定没有发出
+CONNECT_ERRORS = (
+    (aiohttp.ClientConnectorError, getattr(aiohttp, 'ConnectionTimeoutError', aiohttp.ClientConnectorError))
+    if aiohttp else ()
+)
+
+
+async def _stream(encoder):
+    """aiohttp 只接受异步可迭代的流式请求体"""
+    for chunk in encoder:
+        yield chunk
+
+
+class AsyncWeChatPublisher:
+    """异步发布客户端，接口方法与 WeChatPublisher 同名，均为协程；需在 async with 中使用"""
+
+    def __init__(self, dry_run_dir=None):
+        # 配置、缓存、渲染器、重试策略、限流器与运行统计沿用同步发布器
+        self.publisher = WeChatPublisher(dry_run_dir=dry_run_dir)
+        self.metrics = self.publisher.metrics
+        self.concurrency = dict(ENDPOINT_CONCURRENCY)
+        self.concurrency.update(
+            (endpoint, max(1, int(limit))) for endpoint, limit in parse_rates(os.getenv('WECHAT_ASYNC_CONCURRENCY')).items()
+        )
+        # 同时处理的文章数，限制渲染结果等占用的内存
+        self.article_concurrency = max(1, int(os.getenv('WECHAT_ASYNC_ARTICLES', '32')))
+        self.session = None
+        self.http_stats = {'requests': 0, 'connections': 0}
+        self._semaphores = {}
+        self._token_refresh = None
+        self._image_locks = {}
+        self._thumb_locks = {}
+
+    async def __aenter__(self):
+        if not self.publisher.dry_run:
+            if aiohttp is None:
+                raise ImportError("异步客户端需要 aiohttp，请执行 uv sync --extra async")
+            timeout = self.publisher.http.timeout
+            connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.publisher.http.pool_size),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read),
+                trace_configs=[self._trace_config()]
+            )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self.session:
+            await self.session.close()
+
+    def _trace_config(self):
+        """统计请求数和新建连接数，与同步版的连接池统计口径一致"""
+        async def on_request_end(session, context, params):
+            self.http_stats['requests'] += 1
+
+        async def on_connection_create_end(session, context, params):
+            self.http_stats['connections'] += 1
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_end.append(on_request_end)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        return trace
+
+    def stats(self):
+        requests_count, connections = self.http_stats['requests'], self.http_stats['connections']
+        return {'requests': requests_count, 'connections': connections, 'reused': max(requests_count - connections, 0)}
+
+    @staticmethod
+    async def _run(func, *args, **kwargs):
+        """在线程池中执行阻塞或 CPU 密集的同步函数"""
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    def _semaphore(self, endpoint):
+        semaphore = self._semaphores.get(endpoint)
+        if semaphore is None:
+            semaphore = self._semaphores[endpoint] = asyncio.Semaphore(self.concurrency.get(endpoint, DEFAULT_CONCURRENCY))
+        return semaphore
+
+    async def get_access_token(self):
+        """获取access_token；需要刷新时只发起一次请求，其余协程等待同一个结果"""
+        publisher = self.publisher
+        if publisher.access_token and time.time() < publisher.access_token_expires:
+            return publisher.access_token
+        if self._token_refresh is None or self._token_refresh.done():
+            self._token_refresh = asyncio.ensure_future(self._refresh_access_token())
+        # 等待者被取消时不影响刷新本身
+        return await asyncio.shield(self._token_refresh)
+
+    async def _refresh_access_token(self):
+        publisher = self.publisher
+        if publisher.token_store:
+            # 跨进程共享的 token 文件需要持文件锁刷新，在线程中执行同步版本
+            return await self._run(publisher.get_access_token)
+        result = await self._call_api(
+            'GET', 'token', expect='access_token', error_prefix='获取access_token失败',
+            query=f"grant_type=client_credential&appid={publisher.app_id}&secret={publisher.app_secret}",
+            use_token=False
+        )
+        return publisher.set_access_token(result)
+
+    async def _call_api(self, method, endpoint, expect, error_prefix, query='', json_body=None, files=None, use_token=True, binary_ok=False):
+        """调用微信接口，错误分类和重试与同步版相同"""
+        publisher = self.publisher
+        data, headers = encode_request(json_body, files)
+        upload_bytes = len(data) if files else 0
+
+        publisher.retry.record_call(endpoint)
+        attempt = 0
+        while True:
+            access_token = await self.get_access_token() if use_token else None
+            url = api_url(publisher.api_base, endpoint, access_token, query)
+            if upload_bytes:
+                self.metrics.count('upload_bytes', upload_bytes)
+            sent_at = time.time()
+
+            try:
+                if publisher.dry_run:
+                    result = publisher.dry_run.call(endpoint, access_token, query, json_body, files)
+                else:
+                    result = await self._request(method, endpoint, url, data, headers, error_prefix, binary_ok)
+            except CLIENT_ERRORS + (ValueError, WeChatAPIError) as e:
+                error, kind = e, classify_transport_error(endpoint, not isinstance(e, CONNECT_ERRORS))
+            else:
+                failure = check_result(result, expect, error_prefix)
+                if failure is None:
+                    return result
+                error, kind = failure
+
+            if kind == UNCERTAIN:
+                created, kind = await self._check_created(endpoint, json_body, sent_at)
+                if created is not None:
+                    return created
+            if kind == TOKEN_EXPIRED and access_token:
+                # 共享的 token 文件需持文件锁修改，不能在事件循环线程中阻塞
+                await self._run(publisher.invalidate_access_token, access_token)
+            await asyncio.sleep(retry_delay(publisher.retry, endpoint, attempt, error, kind))
+            attempt += 1
+
+    async def _check_created(self, endpoint, json_body, sent_at):
+        """非幂等接口结果未知时避免重复执行，规则与同步版相同"""
+        if not can_reconcile(endpoint):
+            return None, FATAL
+        try:
+            drafts = await self._call_api('POST', 'draft/batchget', expect='item', error_prefix='查询草稿失败',
+                                          json_body=draft_lookup_body())
+        except Exception as e:
+            print(f"⚠️  无法确认草稿是否已创建，不再重试: {e}")
+            return None, FATAL
+        return match_created_draft(drafts, json_body['articles'], sent_at), RETRYABLE
+
+    async def _request(self, method, endpoint, url, data, headers, error_prefix, binary_ok):
+        await self.publisher.rate_limiter.acquire_async(url)
+        async with self._semaphore(endpoint):
+            if isinstance(data, MultipartEncoder):
+                # 长度已知，按 Content-Length 发送而不是分块传输
+                headers = dict(headers, **{'Content-Length': str(len(data))})
+                data = _stream(data)
+            async with self.session.request(method, url, data=data, headers=headers) as response:
+                if response.status >= 500:
+                    raise WeChatAPIError(f"{error_prefix}: HTTP {response.status}")
+                if binary_ok and not response.content_type.startswith(('application/json', 'text/')):
+                    return {}
+                return await response.json(content_type=None)
+
+    async def upload_image(self, image_path):
+        """上传图片到微信服务器，内容未变化的图片直接复用已上传的URL"""
+        publisher = self.publisher
+        digest = await self._run(file_digest, image_path)
+
+        # 多篇文章并发引用同一张图片时，后到的协程等待并复用第一次上传的结果
+        async with self._image_locks.setdefault(digest, asyncio.Lock()):
+            cached = publisher.image_cache.get(digest)
+            if cached and cached.get('size') == os.path.getsize(image_path):
+                return cached['url']
+
+            prepared = await self._run(publisher.image_prep.prepare, image_path)
+            files = {'media': (prepared.filename, prepared.source, prepared.mime)}
+            result = await self._call_api('POST', 'media/uploadimg', expect='url', error_prefix='图片上传失败', files=files)
+
+            publisher.image_cache.put(digest, url=result['url'], size=os.path.getsize(image_path))
+            return result['url']
+
+    async def upload_images(self, image_paths):
+        """并发上传多张图片，返回 {路径: 微信URL或异常}"""
+        results = await asyncio.gather(*(self.upload_image(path) for path in image_paths), return_exceptions=True)
+        return dict(zip(image_paths, results))
+
+    async def upload_thumb_media(self, image_path):
+        """上传缩略图素材"""
+        # 缩略图素材仅支持64KB以内的JPG
+        prepared = await self._run(
+            self.publisher.image_prep.prepare, image_path, max_bytes=THUMB_MAX_BYTES, formats=('JPEG',), max_width=900
+        )
+        files = {'media': (prepared.filename, prepared.source, prepared.mime)}
+        result = await self._call_api(
+            'POST', 'material/add_material', expect='media_id', error_prefix='缩略图上传失败',
+            query='type=thumb', files=files
+        )
+        print(f"✅ 缩略图上传成功，media_id: {result['media_id']}")
+        return result['media_id']
+
+    async def get_thumb_media_id(self, image_path):
+        """获取缩略图media_id：相同内容的缩略图只上传一次，之后复用登记的素材"""
+        registry = self.publisher.thumb_registry
+        digest = await self._run(file_digest, image_path)
+        lock = self._thumb_locks.setdefault(digest, asyncio.Lock())
+
+        # 同一张缩略图（如默认缩略图）被多篇文章并发使用时只上传一次
+        async with lock:
+            entry = registry.get(digest)
+            if entry and await self._thumb_still_valid(digest, entry):
+                self.metrics.count('thumb_reused')
+                return entry['media_id']
+
+            media_id = await self.upload_thumb_media(image_path)
+            registry.put(digest, media_id=media_id, validated_at=time.time())
+            return media_id
+
+    async def _thumb_still_valid(self, digest, entry):
+        """惰性校验，规则与同步版相同"""
+        publisher = self.publisher
+        if not publisher.thumb_needs_check(entry):
+            return True
+        try:
+            await self.get_material(entry['media_id'])
+        except WeChatAPIError as e:
+            return publisher.thumb_checked(digest, e)
+        return publisher.thumb_checked(digest)
+
+    async def find_thumb(self, article_dir):
+        """查找并上传文章的缩略图，查找顺序与同步版相同"""
+        publisher = self.publisher
+        for thumb_path in publisher.thumb_candidates(article_dir):
+            try:
+                thumb_media_id = await self.get_thumb_media_id(thumb_path)
+            except Exception as e:
+                publisher.thumb_failed(thumb_path, e)
+            else:
+                return publisher.thumb_ready(thumb_path, thumb_media_id)
+
+    async def process_markdown_content(self, markdown_content, article_dir):
+        """处理Markdown内容，上传图片并转换HTML"""
+        publisher = self.publisher
+        with self.metrics.span('render'):
+            rendered = await self._run(publisher.render_markdown, markdown_content)
+        with self.metrics.span('images'):
+            uploaded = await self.upload_images(publisher.local_images(rendered['images'], article_dir))
+            return publisher.replace_images(rendered['html'], rendered['images'], article_dir, uploaded)
+
+    async def prepare_article(self, article_info):
+        """渲染文章、上传图片和缩略图，生成草稿数据（见 WeChatPublisher.prepare_article）"""
+        with self.metrics.article(article_info['file_path']):
+            file_path = Path(article_info['file_path'])
+            with self.metrics.span('read'):
+                markdown_content = await self._run(file_path.read_text, encoding='utf-8')
+            html_content = await self.process_markdown_content(markdown_content, file_path.parent)
+            with self.metrics.span('thumb'):
+                thumb_media_id, thumb_source = await self.find_thumb(file_path.parent)
+            return self.publisher.build_parts(article_info, markdown_content, html_content, thumb_media_id, thumb_source)
+
+    async def create_draft(self, title, content, author, digest, thumb_media_id, source_url):
+        """创建草稿"""
+        return await self.create_multi_draft([
+            self.publisher.build_draft_article(title, content, author, digest, thumb_media_id, source_url)
+        ])
+
+    async def create_multi_draft(self, articles):
+        """创建草稿，一个草稿最多包含8篇文章"""
+        result = await self._call_api(
+            'POST', 'draft/add', expect='media_id', error_prefix='创建草稿失败', json_body={"articles": articles}
+        )
+        print(f"✅ 草稿创建成功，media_id: {result['media_id']}")
+        return result['media_id']
+
+    async def publish_draft(self, media_id):
+        """发布草稿"""
+        result = await self._call_api(
+            'POST', 'freepublish/submit', expect='publish_id', error_prefix='发布失败', json_body={"media_id": media_id}
+        )
+        return result.get('publish_id')
+
+    async def get_publish_status(self, publish_id):
+        """查询发布任务状态"""
+        return await self._call_api(
+            'POST', 'freepublish/get', expect='publish_status', error_prefix='查询发布状态失败',
+            json_body={"publish_id": publish_id}
+        )
+
+    async def get_material(self, media_id):
+        """获取永久素材，用于确认素材仍然存在"""
+        return await self._call_api(
+            'POST', 'material/get_material', expect=None, error_prefix='获取素材失败',
+            json_body={"media_id": media_id}, binary_ok=True
+        )
+
+    async def add_draft(self, parts):
+        """为若干篇文章创建一个草稿，返回 media_id；缩略图素材失效时重新上传后再试一次"""
+        publisher = self.publisher
+        thumbs = [await self.draft_thumb(part['thumb_source']) for part in parts]
+        try:
+            return await self.create_multi_draft(publisher.draft_articles(parts, thumbs))
+        except WeChatAPIError as e:
+            if not publisher.drop_stale_thumbs(parts, e):
+                raise
+            thumbs = [await self.draft_thumb(part['thumb_source']) for part in parts]
+            return await self.create_multi_draft(publisher.draft_articles(parts, thumbs))
+
+    async def draft_thumb(self, thumb_source):
+        """草稿使用的缩略图，规则与同步版相同"""
+        return await self._run(self.publisher.registered_thumb, thumb_source) or await self.get_thumb_media_id(thumb_source)
+
+    async def publish_drafts(self, media_ids):
+        """按顺序发布草稿，返回 (publish_id 列表, 状态)；发布失败时草稿保留，需手动发布"""
+        publish_ids = [None] * len(media_ids)
+        try:
+            for index, media_id in enumerate(media_ids):
+                publish_ids[index] = await self.publish_draft(media_id)
+                self.publisher.draft_published(publish_ids[index])
+        except Exception as e:
+            return publish_ids, self.publisher.publish_failed(media_ids, e)
+        return publish_ids, None
+
+    async def publish_article(self, article_info):
+        """发布单篇文章"""
+        with self.metrics.article(article_info['file_path']):
+            parts = await self.prepare_article(article_info)
+            with self.metrics.span('draft'):
+                media_ids = [await self.add_draft([part]) for part in parts]
+            with self.metrics.span('publish'):
+                publish_ids, status = await self.publish_drafts(media_ids)
+        return self.publisher.publish_result([
+            {'media_id': media_id, 'publish_id': publish_id}
+            for media_id, publish_id in zip(media_ids, publish_ids)
+        ], status)
+
+    async def publish_concurrently(self, articles):
+        """所有文章进入同一条流水线并发处理，按完成顺序产出 (文章, 发布结果或异常)"""
+        limit = asyncio.Semaphore(self.article_concurrency)
+
+        async def publish(article):
+            async with limit:
+                print(f"\n📝 正在发布: {article['title']}")
+                try:
+                    return article, await self.publish_article(article)
+                except Exception as e:
+                    return article, e
+
+        for future in asyncio.as_completed([publish(article) for article in articles]):
+            yield await future
+
+    async def publish_batches(self, articles):
+        """批量模式：文章并发渲染和上传素材，多图文草稿按配置的顺序依次创建（见 WeChatPublisher.publish_batches）"""
+        publisher = self.publisher
+        articles = sort_articles(articles, publisher.batch_order)
+        limit = asyncio.Semaphore(self.article_concurrency)
+
+        async def prepare(article):
+            async with limit:
+                print(f"\n📝 正在准备: {article['title']}")
+                return await self.prepare_article(article)
+
+        prepared = await asyncio.gather(*(prepare(article) for article in articles), return_exceptions=True)
+        batches = DraftBatches(articles, prepared, publisher.batch_size)
+        for outcome in batches.failures:
+            yield outcome
+        for group, parts, keys in batches.groups():
+            try:
+                with self.metrics.span('draft', keys):
+                    media_id = await self.add_draft(parts)
+            except Exception as e:
+                for outcome in batches.fail(group, e):
+                    yield outcome
+                continue
+
+            with self.metrics.span('publish', keys):
+                publish_ids, status = await self.publish_drafts([media_id])
+            for outcome in batches.done(group, media_id, publish_ids[0], status):
+                yield outcome
+
+
+async def main_async(argv=None):
+    """异步版主函数，发布记录、状态跟踪和运行报告与 wechat_publisher.main 相同"""
+    args = parse_args(argv)
+    articles = load_articles()
+    if not articles:
+        return
+
+    client = AsyncWeChatPublisher(dry_run_dir=args.dry_run)
+    publisher = client.publisher
+    # 发布任务状态仍由同步发布器在后台线程中轮询
+    store, tracker = open_state(publisher, args.dry_run)
+
+    success_count = 0
+    async with client:
+        if publisher.batch_size > 1:
+            print(f"📦 批量模式：每个草稿最多 {publisher.batch_size} 篇文章，顺序: {publisher.batch_order}")
+            outcomes = client.publish_batches(articles)
+        else:
+            outcomes = client.publish_concurrently(articles)
+        async for article, result in outcomes:
+            success_count += record_outcome(publisher, store, tracker, article, result)
+
+    finish_run(publisher, store, tracker, args.dry_run, success_count, len(articles), http_stats=client.stats())
+
+
+def main(argv=None):
+    asyncio.run(main_async(argv))
+
+
+if __name__ == "__main__":
+    main()
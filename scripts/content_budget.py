@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+草稿正文长度预算
+按接口的口径同时检查字符数和 UTF-8 字节数；超出时先做无损压缩（去掉空白和注释，再对内联样式去重），
+仍然超出则在块级元素边界拆分为多篇，保证每一篇的标签完整闭合
+"""
+
+import os
+import re
+from collections import Counter
+from html.parser import HTMLParser
+
+from css_inliner import INHERITED_PROPERTIES, RELATIVE_VALUE_PATTERN, VOID_TAGS, escape_attr
+from html_minifier import BLOCK_CONTAINERS
+
+# 微信草稿接口：content 必须少于2万字符、小于1M
+CONTENT_MAX_CHARS = 20000
+CONTENT_MAX_BYTES = 1024 * 1024
+
+# 浏览器默认样式与父元素不同的 (标签, 属性)：显式声明即使与继承值相同也不能省略
+PRESET_PROPERTIES = {
+    'a': {'color', 'text-decoration'},
+    'b': {'font-weight'}, 'strong': {'font-weight'},
+    'i': {'font-style'}, 'em': {'font-style'}, 'cite': {'font-style'},
+    'th': {'font-weight', 'text-align'},
+    'code': {'font-family', 'font-size'}, 'pre': {'font-family', 'font-size', 'white-space'},
+    'small': {'font-size'}, 'sub': {'font-size'}, 'sup': {'font-size'},
+}
+PRESET_PROPERTIES.update((f'h{level}', {'font-size', 'font-weight'}) for level in range(1, 7))
+# 子元素上相同的声明可以提升到父元素；font-size 会改变父元素自身 em 单位的含义，不提升
+HOISTED_PROPERTIES = INHERITED_PROPERTIES - {'font-size'}
+
+HEX_COLOR_PATTERN = re.compile(r'#([0-9a-fA-F])\1([0-9a-fA-F])\2([0-9a-fA-F])\3\b')
+ZERO_LENGTH_PATTERN = re.compile(r'(?<![\w.#-])0(?:px|em|rem|%)')
+
+
+def measure(html):
+    """返回 (字符数, UTF-8 字节数)"""
+    return len(html), len(html.encode('utf-8'))
+
+
+def parse_style(style):
+    """style 属性解析为有序的 {属性: 值}"""
+    declarations = {}
+    for item in (style or '').split(';'):
+        name, sep, value = item.partition(':')
+        name, value = name.strip().lower(), value.strip()
+        if sep and name and value:
+            declarations.pop(name, None)
+            declarations[name] = value
+    return declarations
+
+
+def compact_value(value):
+    """等价的更短写法：#ffffff 写作 #fff，0px 写作 0"""
+    return ZERO_LENGTH_PATTERN.sub('0', HEX_COLOR_PATTERN.sub(r'#\1\2\3', value))
+
+
+class _Node:
+    __slots__ = ('tag', 'start', 'end', 'children', 'attrs', 'style')
+
+    def __init__(self, tag, start, attrs=()):
+        self.tag = tag
+        self.start = start
+        self.end = ''
+        self.children = []
+        self.attrs = list(attrs)
+        self.style = parse_style(dict(self.attrs).get('style'))
+
+    def render_start(self):
+        """按当前样式重新生成开始标签"""
+        style = ';'.join(f'{name}:{value}' for name, value in self.style.items())
+        attrs = [(name, value) for name, value in self.attrs if name != 'style']
+        if style:
+            attrs.append(('style', style))
+        self.start = f'<{self.tag}' + ''.join(
+            f' {name}' if value is None else f' {name}="{escape_attr(value)}"' for name, value in attrs
+        ) + '>'
+
+    def html(self):
+        return self.start + ''.join(
+            child if isinstance(child, str) else child.html() for child in self.children
+        ) + self.end
+
+
+class _TreeBuilder(HTMLParser):
+    """把 HTML 解析为保留原始标签文本的节点树，同时去掉块级容器内无意义的空白"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.root = _Node(None, '')
+        self.stack = [self.root]
+        self.pre_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        text = self.get_starttag_text()
+        if tag in VOID_TAGS:
+            self.stack[-1].children.append(text)
+            return
+        node = _Node(tag, text, attrs)
+        self.stack[-1].children.append(node)
+        self.stack.append(node)
+        if tag == 'pre':
+            self.pre_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.stack[-1].children.append(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        for index in range(len(self.stack) - 1, 0, -1):
+            if self.stack[index].tag == tag:
+                self.stack[index].end = f'</{tag}>'
+                for node in self.stack[index:]:
+                    if node.tag == 'pre':
+                        self.pre_depth -= 1
+                del self.stack[index:]
+                return
+        self.stack[-1].children.append(f'</{tag}>')
+
+    def handle_data(self, data):
+        parent = self.stack[-1]
+        if not data.strip() and not self.pre_depth and (parent is self.root or parent.tag in BLOCK_CONTAINERS):
+            return
+        parent.children.append(data)
+
+    def handle_entityref(self, name):
+        self.stack[-1].children.append(f'&{name};')
+
+    def handle_charref(self, name):
+        self.stack[-1].children.append(f'&#{name};')
+
+    def handle_comment(self, data):
+        pass
+
+    def handle_decl(self, decl):
+        self.stack[-1].children.append(f'<!{decl}>')
+
+
+def parse_tree(html):
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+def _elements(node):
+    return [child for child in node.children if not isinstance(child, str)]
+
+
+def _declaration_size(name, value):
+    return len(name) + len(value) + 2
+
+
+def _hoist_styles(node, inherited):
+    """自底向上：多个子元素声明了相同的可继承样式时，改为在父元素上声明一次
+
+    没有声明该属性的子元素补上原来继承到的值，只在总长度变短时提升；父元素不能有直接的文本或空元素
+    （它们也会继承），浏览器默认样式涉及该属性的元素（如链接的颜色）不参与
+    """
+    computed = dict(inherited, **{
+        name: value for name, value in node.style.items() if name in INHERITED_PROPERTIES and value != 'inherit'
+    })
+    children = _elements(node)
+    for child in children:
+        _hoist_styles(child, computed)
+    if node.tag is None or node.tag == 'pre' or len(children) < 2 or len(children) != len(node.children):
+        return
+
+    candidates = Counter(
+        (name, value)
+        for child in children
+        for name, value in child.style.items()
+        if name in HOISTED_PROPERTIES and name not in PRESET_PROPERTIES.get(child.tag, ())
+        and value != 'inherit' and not RELATIVE_VALUE_PATTERN.search(value)
+    )
+    hoisted = set()
+    for (name, value), count in candidates.most_common():
+        if count < 2 or name in hoisted or name in PRESET_PROPERTIES.get(node.tag, ()):
+            continue
+        current = computed.get(name)
+        if current == value:
+            continue
+        overrides = [
+            child for child in children
+            if child.style.get(name, 'inherit') == 'inherit' and name not in PRESET_PROPERTIES.get(child.tag, ())
+        ]
+        if overrides and (current is None or RELATIVE_VALUE_PATTERN.search(current)):
+            continue
+        size = _declaration_size(name, value)
+        saved = (count - 1) * size - sum(_declaration_size(name, current) for _ in overrides)
+        if saved <= 0:
+            continue
+
+        hoisted.add(name)
+        node.style[name] = computed[name] = value
+        for child in children:
+            if child in overrides:
+                child.style[name] = current
+            elif child.style.get(name) == value and name not in PRESET_PROPERTIES.get(child.tag, ()):
+                del child.style[name]
+
+
+def _drop_inherited(node, inherited):
+    """自顶向下：去掉与继承值相同的可继承声明，并压缩声明的值"""
+    for child in _elements(node):
+        preset = PRESET_PROPERTIES.get(child.tag, ())
+        style = {}
+        for name, value in child.style.items():
+            value = compact_value(value)
+            if (name in INHERITED_PROPERTIES and name not in preset and inherited.get(name) == value
+                    and not RELATIVE_VALUE_PATTERN.search(value)):
+                continue
+            style[name] = value
+        child.style = style
+        child.render_start()
+        _drop_inherited(child, dict(inherited, **{
+            name: value for name, value in style.items() if name in INHERITED_PROPERTIES
+        }))
+
+
+def dedupe_styles(tree):
+    """内联样式去重：子元素共有的可继承样式提升到父元素，再去掉与继承值重复的声明，渲染效果不变"""
+    _hoist_styles(tree, {})
+    _drop_inherited(tree, {})
+
+
+class ContentBudget:
+    """正文长度预算"""
+
+    def __init__(self, max_chars=None, max_bytes=None):
+        self.max_chars = max_chars or int(os.getenv('WECHAT_CONTENT_MAX_CHARS', str(CONTENT_MAX_CHARS)))
+        self.max_bytes = max_bytes or int(os.getenv('WECHAT_CONTENT_MAX_BYTES', str(CONTENT_MAX_BYTES)))
+
+    def fits(self, html):
+        chars, size = measure(html)
+        # 接口的限制不含上限本身：恰好2万字符同样报 45002
+        return chars < self.max_chars and size < self.max_bytes
+
+    def fit(self, html):
+        """返回满足长度限制的正文列表，不超限时只有一篇"""
+        if self.fits(html):
+            return [html]
+        # 无损压缩：去掉注释和块级元素之间的空白
+        tree = parse_tree(html)
+        html = tree.html()
+        if self.fits(html):
+            return [html]
+        # 内联样式去重，逐个元素重复的样式是正文超长的主要原因
+        dedupe_styles(tree)
+        html = tree.html()
+        if self.fits(html):
+            return [html]
+
+        # 渲染结果只有一个根容器（.content），在它的子元素之间拆分，每篇都带上根容器
+        top = [child for child in tree.children if not isinstance(child, str)]
+        if len(top) == 1:
+            return self._split(top[0], '', '')
+        return self._split(tree, '', '')
+
+    def _split(self, node, prefix, suffix):
+        """按子元素贪心装箱；单个子元素放不下时递归拆分它的子元素"""
+        prefix += node.start
+        suffix = node.end + suffix
+        overhead_chars, overhead_bytes = measure(prefix + suffix)
+        # 每篇允许的最大长度，比上限少 1
+        limit_chars = self.max_chars - 1 - overhead_chars
+        limit_bytes = self.max_bytes - 1 - overhead_bytes
+        if limit_chars <= 0 or limit_bytes <= 0:
+            raise ValueError(f"嵌套过深，无法在长度限制内拆分: {prefix[:200]}")
+
+        parts = []
+        current = []
+        used_chars = used_bytes = 0
+
+        def flush():
+            nonlocal used_chars, used_bytes
+            if current:
+                parts.append(prefix + ''.join(current) + suffix)
+                current.clear()
+                used_chars = used_bytes = 0
+
+        for child in node.children:
+            html = child if isinstance(child, str) else child.html()
+            chars, size = measure(html)
+            if chars > limit_chars or size > limit_bytes:
+                flush()
+                if isinstance(child, str):
+                    parts.extend(prefix + piece + suffix for piece in self._split_text(child, limit_chars, limit_bytes))
+                else:
+                    parts.extend(self._split(child, prefix, suffix))
+                continue
+            if used_chars + chars > limit_chars or used_bytes + size > limit_bytes:
+                flush()
+            current.append(html)
+            used_chars += chars
+            used_bytes += size
+        flush()
+        return parts
+
+    @staticmethod
+    def _split_text(text, limit_chars, limit_bytes):
+        """超长文本按行拆分，单行仍超长时按字符截断（实体已单独成节点，不会被截断）"""
+        pieces = []
+        current = ''
+        for line in text.splitlines(keepends=True):
+            while line:
+                candidate = current + line
+                if len(candidate) <= limit_chars and len(candidate.encode('utf-8')) <= limit_bytes:
+                    current = candidate
+                    break
+                if current:
+                    pieces.append(current)
+                    current = ''
+                    continue
+                cut = min(len(line), limit_chars)
+                while len(line[:cut].encode('utf-8')) > limit_bytes:
+                    cut -= 1
+                pieces.append(line[:cut])
+                line = line[cut:]
+        if current:
+            pieces.append(current)
+        return pieces
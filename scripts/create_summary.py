@@ -1,8 +1,56 @@
 #!/usr/bin/env python3
 import json
+import os
 from pathlib import Path
 from datetime import datetime
 
+from instrumentation import RUN_REPORT_PATH, STAGES
+
+STAGE_LABELS = {
+    'read': '读取',
+    'render': '渲染',
+    'images': '图片上传',
+    'thumb': '缩略图',
+    'draft': '草稿',
+    'publish': '发布',
+}
+
+def print_run_report(report):
+    """各文章分阶段耗时表及接口调用统计"""
+    articles = report.get('articles') or []
+    if articles:
+        print("\n### ⏱️ 各阶段耗时（秒）\n")
+        print("| 文章 | " + " | ".join(STAGE_LABELS[stage] for stage in STAGES) + " | 合计 | 结果 |")
+        print("|" + "---|" * (len(STAGES) + 3))
+        for article in articles:
+            stages = article.get('stages', {})
+            cells = [f"{stages[stage]:.2f}" if stage in stages else "-" for stage in STAGES]
+            error = article.get('error', '').replace('|', '\\|').replace('\n', ' ')
+            result = '✅' if article.get('status') == 'success' else f"❌ {error}"[:80]
+            title = article.get('title') or article['file_path']
+            print(f"| {title} | " + " | ".join(cells) + f" | {article.get('total', 0):.2f} | {result} |")
+    
+    api = report.get('api') or {}
+    if api:
+        print("\n### 🔌 接口调用\n")
+        print("| 接口 | 调用 | 重试 | 失败 |")
+        print("|---|---|---|---|")
+        for endpoint, stats in sorted(api.items()):
+            print(f"| `{endpoint}` | {stats['calls']} | {stats['retries']} | {stats['failures']} |")
+    
+    counters = report.get('counters') or {}
+    caches = report.get('caches') or {}
+    print("")
+    if 'upload_bytes' in counters:
+        print(f"- 上传字节数: {counters['upload_bytes']}")
+    for name, label in (('image', '图片缓存'), ('render', '渲染缓存')):
+        if name in caches:
+            print(f"- {label}: 命中 {caches[name]['hits']} 次，未命中 {caches[name]['misses']} 次")
+    if 'thumb_reused' in counters:
+        print(f"- 复用缩略图素材: {counters['thumb_reused']} 次")
+    if 'duration' in report:
+        print(f"- 发布脚本耗时: {report['duration']:.1f}s")
+
 def main():
     """生成GitHub Actions摘要"""
     
@@ -29,8 +77,19 @@ def main():
         for article in published_articles:
             print(f"- ✅ **{article['title']}**")
             print(f"  - 文件: `{article['file_path']}`")
+            record = published_record.get(str(Path(article['file_path']).relative_to('articles')), {})
+            if record.get('publish_status'):
+                print(f"  - 发布状态: {record['publish_status']}")
+            if record.get('article_url'):
+                print(f"  - 链接: {record['article_url']}")
             print("")
     
+    # 本次运行的耗时与接口统计
+    report_file = Path(os.getenv('WECHAT_RUN_REPORT', RUN_REPORT_PATH))
+    if report_file.exists():
+        with open(report_file, 'r', encoding='utf-8') as f:
+            print_run_report(json.load(f))
+    
     # 统计信息
     total_articles = len(published_record)
     print(f"\n### 📊 统计信息\n")
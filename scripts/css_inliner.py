@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+CSS 内联
+样式表只解析一次，得到 选择器→声明 的映射；渲染时只把命中的声明写入元素的 style 属性。
+微信编辑器会过滤 <style> 块和伪元素，这些在解析阶段就被丢弃；声明会在每个匹配的元素上重复，
+阴影、圆角、渐变等装饰同样丢弃，与父元素继承值相同的声明省略，避免正文超出草稿长度限制
+"""
+
+import hashlib
+import re
+from collections import namedtuple
+from html import escape
+from html.parser import HTMLParser
+from pathlib import Path
+
+STYLESHEET_PATH = Path(__file__).parent / 'wechat_style.css'
+
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+# 微信不支持或内联后无意义的属性，以及逐个元素重复代价高、对排版没有影响的装饰
+DROPPED_PROPERTIES = {
+    'position', 'top', 'right', 'bottom', 'left', 'z-index', 'transform', 'transition',
+    'content', 'counter-reset', 'counter-increment', 'background-clip', 'background-attachment',
+    'box-shadow', 'text-shadow', 'border-radius', 'animation', 'cursor',
+}
+
+# 会被子元素继承的属性：与父元素继承值相同的声明可以省略
+INHERITED_PROPERTIES = {
+    'color', 'font-family', 'font-size', 'font-style', 'font-weight', 'letter-spacing',
+    'line-height', 'text-align', 'text-indent', 'text-transform', 'word-spacing',
+}
+RELATIVE_VALUE_PATTERN = re.compile(r'\d(em|rem|%)')
+
+COMMENT_PATTERN = re.compile(r'/\*.*?\*/', re.DOTALL)
+COMPOUND_PATTERN = re.compile(r'^([a-z][a-z0-9]*)?((?:\.[\w-]+)*)(?::nth-child\((even|odd)\))?$')
+COMMA_PATTERN = re.compile(r'\s*,\s*')
+
+Rule = namedtuple('Rule', ['compounds', 'specificity', 'order', 'declarations'])
+Compound = namedtuple('Compound', ['tag', 'classes', 'nth'])
+
+
+def strip_at_rules(css):
+    """去掉 @media 等 @ 规则（含嵌套的大括号块）"""
+    result = []
+    index = 0
+    while index < len(css):
+        at = css.find('@', index)
+        if at < 0:
+            result.append(css[index:])
+            break
+        result.append(css[index:at])
+        brace = css.find('{', at)
+        semicolon = css.find(';', at)
+        if brace < 0 or (0 <= semicolon < brace):
+            index = semicolon + 1 if semicolon >= 0 else len(css)
+            continue
+        depth = 0
+        for index in range(brace, len(css)):
+            if css[index] == '{':
+                depth += 1
+            elif css[index] == '}':
+                depth -= 1
+                if depth == 0:
+                    break
+        index += 1
+    return ''.join(result)
+
+
+def parse_declarations(body):
+    """解析声明块，丢弃微信不支持的属性和渐变"""
+    declarations = []
+    for item in body.split(';'):
+        name, sep, value = item.partition(':')
+        # 值内用单引号并去掉逗号两侧空白，写入 style 属性时无需转义
+        name, value = name.strip().lower(), COMMA_PATTERN.sub(',', value.strip().replace('"', "'"))
+        if not sep or not name or not value:
+            continue
+        if name.startswith('-webkit-') or name in DROPPED_PROPERTIES or 'gradient(' in value:
+            continue
+        declarations.append((name, value))
+
+    # 文字镂空背景（background-clip: text）无法内联，直接去掉背景
+    if re.search(r'(^|;)\s*(-webkit-)?background-clip\s*:\s*text', body):
+        declarations = [(name, value) for name, value in declarations if not name.startswith('background')]
+    return declarations
+
+
+def parse_selector(selector):
+    """解析为复合选择器列表（后代组合），不支持的选择器返回 None"""
+    compounds = []
+    for part in selector.split():
+        match = COMPOUND_PATTERN.match(part)
+        if not match:
+            return None
+        tag, classes, nth = match.groups()
+        # body 的样式落到渲染结果的根容器上
+        if tag == 'body':
+            tag, classes = None, '.content' + classes
+        compounds.append(Compound(tag, frozenset(classes.split('.')[1:]), nth))
+    return compounds or None
+
+
+def parse_stylesheet(css):
+    """解析样式表为规则列表"""
+    css = strip_at_rules(COMMENT_PATTERN.sub('', css))
+    rules = []
+    for selectors, body in re.findall(r'([^{}]+)\{([^{}]*)\}', css):
+        declarations = parse_declarations(body)
+        if not declarations:
+            continue
+        for selector in selectors.split(','):
+            compounds = parse_selector(selector.strip())
+            if compounds is None:
+                continue
+            specificity = (
+                sum(len(c.classes) + (1 if c.nth else 0) for c in compounds),
+                sum(1 for c in compounds if c.tag)
+            )
+            rules.append(Rule(compounds, specificity, len(rules), declarations))
+    return rules
+
+
+def escape_attr(value):
+    """属性值转义，单引号保持原样"""
+    return escape(value, quote=False).replace('"', '&quot;')
+
+
+class _Element:
+    __slots__ = ('tag', 'classes', 'children', 'inherited')
+
+    def __init__(self, tag, classes):
+        self.tag = tag
+        self.classes = classes
+        self.children = 0
+        self.inherited = ()
+
+
+class CSSInliner:
+    """预先计算好样式映射的内联器，线程安全（每次转换使用独立的解析器）"""
+
+    def __init__(self, css=None):
+        if css is None:
+            css = STYLESHEET_PATH.read_text(encoding='utf-8')
+        self.version = hashlib.blake2b(css.encode('utf-8'), digest_size=8).hexdigest()
+        self.rules = parse_stylesheet(css)
+
+        # 按最右侧复合选择器的标签/类名建立索引，匹配时只检查候选规则
+        self.by_tag = {}
+        self.by_class = {}
+        self.universal = []
+        for rule in self.rules:
+            subject = rule.compounds[-1]
+            if subject.classes:
+                self.by_class.setdefault(min(subject.classes), []).append(rule)
+            elif subject.tag:
+                self.by_tag.setdefault(subject.tag, []).append(rule)
+            else:
+                self.universal.append(rule)
+        self._styles = {}
+
+    @staticmethod
+    def _matches_compound(compound, element, position=None):
+        if compound.tag and compound.tag != element.tag:
+            return False
+        if not compound.classes <= element.classes:
+            return False
+        if compound.nth and position is not None:
+            return position % 2 == (0 if compound.nth == 'even' else 1)
+        return not compound.nth
+
+    def _matches(self, rule, element, position, ancestors):
+        *context, subject = rule.compounds
+        if not self._matches_compound(subject, element, position):
+            return False
+        # 后代组合：从右向左在祖先链中依次查找
+        index = len(ancestors) - 1
+        for compound in reversed(context):
+            while index >= 0 and not self._matches_compound(compound, ancestors[index]):
+                index -= 1
+            if index < 0:
+                return False
+            index -= 1
+        return True
+
+    def style_for(self, element, position, ancestors):
+        """计算元素的内联样式，同时记录元素向下继承的属性值"""
+        candidates = list(self.by_tag.get(element.tag, ()))
+        for cls in element.classes:
+            candidates.extend(self.by_class.get(cls, ()))
+        candidates.extend(self.universal)
+        matched = tuple(sorted(
+            {rule.order for rule in candidates if self._matches(rule, element, position, ancestors)},
+            key=lambda order: (self.rules[order].specificity, order)
+        ))
+        parent_inherited = ancestors[-1].inherited if ancestors else ()
+        if not matched:
+            element.inherited = parent_inherited
+            return ''
+
+        key = (matched, parent_inherited)
+        cached = self._styles.get(key)
+        if cached is None:
+            declarations = {}
+            for order in matched:
+                for name, value in self.rules[order].declarations:
+                    declarations.pop(name, None)
+                    declarations[name] = value
+
+            # 去掉与父元素继承值重复的声明；em/% 等相对单位会按父元素再次计算，必须保留
+            inherited = dict(parent_inherited)
+            for name, value in list(declarations.items()):
+                if name not in INHERITED_PROPERTIES:
+                    continue
+                if value == 'inherit' or (inherited.get(name) == value and not RELATIVE_VALUE_PATTERN.search(value)):
+                    del declarations[name]
+                else:
+                    inherited[name] = value
+            style = ';'.join(f'{name}:{value}' for name, value in declarations.items())
+            cached = self._styles[key] = (style, tuple(sorted(inherited.items())))
+        element.inherited = cached[1]
+        return cached[0]
+
+    def inline(self, html):
+        """把样式内联到 HTML 元素上"""
+        parser = _InlineParser(self)
+        parser.feed(html)
+        parser.close()
+        return ''.join(parser.output)
+
+
+class _InlineParser(HTMLParser):
+    """逐个标签输出，维护祖先链用于匹配后代选择器"""
+
+    def __init__(self, inliner):
+        super().__init__(convert_charrefs=False)
+        self.inliner = inliner
+        self.output = []
+        self.stack = [_Element(None, frozenset())]
+
+    def _start(self, tag, attrs, closed):
+        parent = self.stack[-1]
+        parent.children += 1
+        attrs = dict(attrs)
+        element = _Element(tag, frozenset((attrs.get('class') or '').split()))
+
+        style = self.inliner.style_for(element, parent.children, self.stack[1:])
+        if style:
+            # 已有的行内样式优先级更高，放在后面
+            attrs['style'] = f"{style};{attrs['style']}" if attrs.get('style') else style
+
+        rendered = ''.join(
+            f' {name}' if value is None else f' {name}="{escape_attr(value)}"'
+            for name, value in attrs.items()
+        )
+        self.output.append(f'<{tag}{rendered}{" /" if closed else ""}>')
+        if not closed and tag not in VOID_TAGS:
+            self.stack.append(element)
+
+    def handle_starttag(self, tag, attrs):
+        self._start(tag, attrs, False)
+
+    def handle_startendtag(self, tag, attrs):
+        self._start(tag, attrs, True)
+
+    def handle_endtag(self, tag):
+        for index in range(len(self.stack) - 1, 0, -1):
+            if self.stack[index].tag == tag:
+                del self.stack[index:]
+                break
+        self.output.append(f'</{tag}>')
+
+    def handle_data(self, data):
+        self.output.append(data)
+
+    def handle_entityref(self, name):
+        self.output.append(f'&{name};')
+
+    def handle_charref(self, name):
+        self.output.append(f'&#{name};')
+
+    def handle_comment(self, data):
+        self.output.append(f'<!--{data}-->')
+
+    def handle_decl(self, decl):
+        self.output.append(f'<!{decl}>')
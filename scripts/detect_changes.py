@@ -1,106 +1,240 @@
 #!/usr/bin/env python3
 import os
 import json
+import re
 import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
-def get_git_changes():
-    """获取Git变更的文件列表"""
-    # 获取最近一次提交的变更
-    result = subprocess.run(
-        ['git', 'diff', '--name-only', 'HEAD~1', 'HEAD'],
-        capture_output=True, text=True
-    )
-    
-    if result.returncode != 0:
-        # 如果是第一次提交，获取所有文件
-        result = subprocess.run(
-            ['git', 'ls-files'],
-            capture_output=True, text=True
-        )
-    
-    return result.stdout.strip().split('\n') if result.stdout.strip() else []
+from article_index import ArticleIndex
+from hashing import article_digest, local_image_refs
+from media_cache import cache_root
+from publish_state import PublishStateStore
 
-def load_published_record():
-    """加载已发布记录"""
-    published_file = Path('config/published.json')
-    if published_file.exists():
-        with open(published_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
+def run_git(*args):
+    """执行git命令，返回 (returncode, stdout)"""
+    result = subprocess.run(['git', *args], capture_output=True, text=True)
+    return result.returncode, result.stdout
 
-def save_published_record(record):
-    """保存已发布记录"""
-    published_file = Path('config/published.json')
-    published_file.parent.mkdir(exist_ok=True)
+def get_head_commit():
+    """当前HEAD的提交SHA"""
+    returncode, stdout = run_git('rev-parse', 'HEAD')
+    return stdout.strip() if returncode == 0 else None
+
+def parse_name_status(output):
+    """解析 git diff --name-status -z 的输出，返回 [(状态, 路径, 原路径)]"""
+    tokens = output.split('\0')
+    changes = []
+    i = 0
+    while i < len(tokens) and tokens[i]:
+        status = tokens[i][0]
+        if status in ('R', 'C'):
+            changes.append((status, tokens[i + 2], tokens[i + 1]))
+            i += 3
+        else:
+            changes.append((status, tokens[i + 1], None))
+            i += 2
+    return changes
+
+def get_git_changes(base_commit=None):
+    """获取Git变更的文件列表，返回 [(状态, 路径, 原路径)]
+    
+    有上次发布的提交时比较整个推送范围，否则只比较最近一次提交
+    """
+    if base_commit and run_git('cat-file', '-e', f'{base_commit}^{{commit}}')[0] != 0:
+        print(f"⚠️  上次发布的提交 {base_commit[:8]} 不可达，改为比较最近一次提交")
+        base_commit = None
+    
+    returncode, stdout = run_git('diff', '--name-status', '-z', '-M', base_commit or 'HEAD~1', 'HEAD')
+    if returncode == 0:
+        return parse_name_status(stdout)
     
-    with open(published_file, 'w', encoding='utf-8') as f:
-        json.dump(record, f, indent=2, ensure_ascii=False)
+    # 如果是第一次提交，获取所有文件
+    returncode, stdout = run_git('ls-files', '-z')
+    return [('A', path, None) for path in stdout.split('\0') if path]
+
+def record_published_commit(store, commit):
+    """记录已全部发布的提交，下次检测从这里开始比较"""
+    if commit:
+        store.set_meta('last_published_commit', commit)
+
+def article_for_path(path):
+    """变更文件所属的文章：Markdown本身，或图片所在目录及上级目录中的 index.md"""
+    if not path.startswith('articles/'):
+        return None
+    if path.endswith('.md'):
+        return path
+    parent = Path(path).parent
+    while parent != Path('articles') and parent != parent.parent:
+        if (parent / 'index.md').exists():
+            return str(parent / 'index.md')
+        parent = parent.parent
+    return None
+
+TITLE_PATTERN = re.compile(r'^#\s+(.+)$', re.MULTILINE)
+
+def read_article(md_file):
+    """读取文章原始字节"""
+    with open(md_file, 'rb') as f:
+        return f.read()
 
-def get_article_info(md_file):
-    """获取文章信息"""
-    with open(md_file, 'r', encoding='utf-8') as f:
-        content = f.read()
+def analyze_article(md_file, raw):
+    """从文章内容提取标题并计算摘要，返回 (文章信息, 引用的图片)
     
-    # 提取元数据
-    import re
+    只依赖参数，可在子进程中执行
+    """
+    content = raw.decode('utf-8')
     
     # 提取标题
-    title_match = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
+    title_match = TITLE_PATTERN.search(content)
     title = title_match.group(1).strip() if title_match else Path(md_file).stem
     
     # 获取文件修改时间
     mtime = os.path.getmtime(md_file)
     
-    return {
+    info = {
         'title': title,
         'file_path': str(md_file),
         'modified_time': mtime,
-        'content_hash': hash(content)
+        'content_hash': article_digest(md_file, raw)
     }
+    return info, local_image_refs(content, Path(md_file).parent)
+
+def scan_articles(md_files, index=None, workers=None):
+    """批量获取文章信息，返回 {文件路径: 文章信息}
+    
+    索引未命中的文章较多时，用线程池读取文件、进程池计算哈希和提取标题
+    """
+    if workers is None:
+        workers = int(os.getenv('DETECT_WORKERS', '0')) or os.cpu_count() or 1
+    
+    results = {}
+    pending = []
+    for md_file in md_files:
+        md_file = str(md_file)
+        file_key = str(Path(md_file).relative_to('articles'))
+        cached = index.lookup(file_key, md_file) if index is not None else None
+        if cached is not None:
+            results[md_file] = dict(cached, file_path=md_file)
+        else:
+            pending.append(md_file)
+    
+    if workers > 1 and len(pending) > workers:
+        with ThreadPoolExecutor(max_workers=workers) as readers:
+            raws = list(readers.map(read_article, pending))
+        with ProcessPoolExecutor(max_workers=workers) as hashers:
+            analyzed = list(hashers.map(analyze_article, pending, raws, chunksize=max(1, len(pending) // (workers * 4))))
+    else:
+        analyzed = [analyze_article(md_file, read_article(md_file)) for md_file in pending]
+    
+    for md_file, (info, refs) in zip(pending, analyzed):
+        if index is not None:
+            index.store(str(Path(md_file).relative_to('articles')), md_file, info, refs)
+        results[md_file] = info
+    return results
+
+def migrate_legacy_hashes(store, changed_keys):
+    """把旧版 hash() 记录迁移为稳定摘要
+    
+    旧值每次运行都不同，无法比较；本次未变更的文章视为与已发布内容一致，直接补写新摘要
+    """
+    migrated = 0
+    for file_key in store.legacy_hash_paths():
+        if file_key in changed_keys:
+            continue
+        md_file = Path('articles') / file_key
+        if not md_file.exists():
+            continue
+        store.update(file_key, content_hash=article_digest(md_file))
+        migrated += 1
+    return migrated
+
+def find_renamed(store, content_hash):
+    """git 没有识别出的重命名（如跨多个提交先删除再添加）：按内容摘要找回原路径已不存在的发布记录"""
+    for old_key in store.find_by_hash(content_hash):
+        if not (Path('articles') / old_key).exists():
+            return old_key
+    return None
 
 def main():
     # 强制发布模式
     force_publish = os.getenv('INPUT_FORCE_PUBLISH', 'false').lower() == 'true'
     
-    # 获取变更文件
-    changed_files = get_git_changes()
+    # 加载已发布记录
+    store = PublishStateStore()
+    head_commit = get_head_commit()
+    
+    # 获取从上次发布到HEAD之间的全部变更
+    changes = get_git_changes(store.get_meta('last_published_commit'))
     
-    # 过滤出markdown文件
-    md_files = [f for f in changed_files if f.endswith('.md') and f.startswith('articles/')]
+    # 过滤出文章：Markdown变更以及文章内图片的变更
+    md_files = []
+    for status, path, old_path in changes:
+        if status == 'D':
+            if path.startswith('articles/') and path.endswith('.md'):
+                print(f"🗑️  文章已删除: {path}")
+            continue
+        if status == 'R' and old_path.startswith('articles/') and path.startswith('articles/') and path.endswith('.md'):
+            # 重命名的文章沿用原发布记录，内容未变时不会重新发布
+            old_key = str(Path(old_path).relative_to('articles'))
+            new_key = str(Path(path).relative_to('articles'))
+            if old_key in store and new_key not in store:
+                store.rename(old_key, new_key)
+                print(f"🔀 文章已重命名: {old_path} -> {path}")
+        md_file = article_for_path(path)
+        if md_file and md_file not in md_files:
+            md_files.append(md_file)
     
     if force_publish:
         # 强制模式：获取所有文章
         md_files = list(Path('articles').rglob('*.md'))
         md_files = [str(f) for f in md_files]
     
-    # 加载已发布记录
-    published_record = load_published_record()
+    # 文章索引：未变化的文章跳过读取与哈希计算
+    index = ArticleIndex(cache_root() / 'article_index.json')
+    if force_publish:
+        index.prune(str(Path(f).relative_to('articles')) for f in md_files)
     
-    # 检测需要发布的文章
+    # 迁移旧版哈希记录（强制模式下所有文章都会重新发布，无需迁移）
+    if not force_publish:
+        changed_keys = {str(Path(f).relative_to('articles')) for f in md_files}
+        migrated = migrate_legacy_hashes(store, changed_keys)
+        if migrated:
+            print(f"🔄 已将 {migrated} 条旧版哈希记录迁移为稳定摘要")
+    
+    # 检测需要发布的文章，按路径排序保证输出顺序稳定
     to_publish = []
+    md_files = sorted(f for f in md_files if Path(f).exists())
+    articles = scan_articles(md_files, index)
     
     for md_file in md_files:
-        if not Path(md_file).exists():
-            continue
-            
-        article_info = get_article_info(md_file)
+        article_info = articles[md_file]
         file_key = str(Path(md_file).relative_to('articles'))
         
         # 检查是否需要发布
         should_publish = False
+        record = store.get(file_key)
         
         if force_publish:
             should_publish = True
-        elif file_key not in published_record:
-            should_publish = True
-        elif published_record[file_key]['content_hash'] != article_info['content_hash']:
+        elif record is None:
+            old_key = find_renamed(store, article_info['content_hash'])
+            if old_key:
+                # 内容与已发布的文章相同，沿用原发布记录
+                store.rename(old_key, file_key)
+                print(f"🔀 文章已重命名: articles/{old_key} -> {md_file}")
+            else:
+                should_publish = True
+        elif record['content_hash'] != article_info['content_hash']:
             should_publish = True
         
         if should_publish:
             to_publish.append(article_info)
     
+    index.save()
+    print(f"📇 文章索引命中 {index.hits} 篇，重新计算 {index.misses} 篇")
+    
     # 输出结果
     if to_publish:
         print(f"发现 {len(to_publish)} 篇需要发布的文章:")
@@ -116,8 +250,14 @@ def main():
             f.write('has_changes=true\n')
     else:
         print("没有发现需要发布的文章")
+        # 没有待发布文章时直接推进发布进度
+        record_published_commit(store, head_commit)
         with open(os.environ['GITHUB_OUTPUT'], 'a') as f:
             f.write('has_changes=false\n')
+    
+    # 重命名、哈希迁移、发布进度等变化同步到导出文件
+    store.export_json()
+    store.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+内容哈希工具
+使用 BLAKE2b 计算确定性的内容摘要，大文件分块读取
+"""
+
+import hashlib
+import re
+from pathlib import Path
+
+CHUNK_SIZE = 1024 * 1024
+DIGEST_SIZE = 20
+
+# 与发布脚本一致的图片引用语法
+IMAGE_PATTERN = re.compile(r'!\[(.*?)\]\((.*?)\)')
+
+
+def file_digest(path):
+    """计算文件内容的摘要（十六进制）"""
+    h = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    _update_from_file(h, path)
+    return h.hexdigest()
+
+
+def _update_from_file(h, path):
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+
+
+def local_image_refs(markdown_text, article_dir):
+    """文章引用的本地图片（去重、按路径排序）"""
+    refs = set()
+    for match in IMAGE_PATTERN.finditer(markdown_text):
+        img_path = match.group(2)
+        if img_path.startswith(('http://', 'https://')):
+            continue
+        full_path = Path(article_dir) / img_path
+        if full_path.is_file():
+            refs.add(img_path)
+    return sorted(refs)
+
+
+def article_digest(md_path, content=None):
+    """文章内容摘要：覆盖Markdown正文及其引用的本地图片字节，跨进程稳定"""
+    md_path = Path(md_path)
+    if content is None:
+        content = md_path.read_bytes()
+    elif isinstance(content, str):
+        content = content.encode('utf-8')
+
+    h = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    h.update(content)
+    for img_path in local_image_refs(content.decode('utf-8', errors='replace'), md_path.parent):
+        # 写入路径作为分隔，图片改名或替换都会改变摘要
+        h.update(b'\0' + img_path.encode('utf-8') + b'\0')
+        _update_from_file(h, md_path.parent / img_path)
+    return h.hexdigest()
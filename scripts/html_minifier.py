@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+HTML 压缩
+在内联样式之后流式处理渲染结果：折叠 <pre> 之外的空白，去掉注释、空属性和已失效的 class，
+展开没有属性的 <span>（Pygments 的高亮标记在微信中没有样式），合并相邻的相同 <span>
+
+直接运行时对 articles/ 下的文章做基准测试，输出压缩前后的字节数
+"""
+
+import re
+from html.parser import HTMLParser
+
+from css_inliner import VOID_TAGS, escape_attr
+
+# 子元素之间的空白不影响排版的容器
+BLOCK_CONTAINERS = {
+    'blockquote', 'div', 'dl', 'ol', 'section', 'table', 'tbody', 'tfoot', 'thead', 'tr', 'ul'
+}
+# 样式已内联，微信会过滤样式表，class 不再起作用
+DROPPED_ATTRIBUTES = {'class'}
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+class _Minifier(HTMLParser):
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.output = []
+        self.stack = []
+        self.pre_depth = 0
+        # 刚输出的 </span> 对应的开始标签，紧跟相同的 <span> 时两者合并
+        self.closed_span = None
+
+    def _emit(self, text):
+        self.closed_span = None
+        self.output.append(text)
+
+    def _start(self, tag, attrs, closed):
+        rendered = ''.join(
+            f' {name}' if value is None else f' {name}="{escape_attr(value)}"'
+            for name, value in attrs
+            if name not in DROPPED_ATTRIBUTES and value != ''
+        )
+        start = f'<{tag}{rendered}{" /" if closed else ""}>'
+        if closed or tag in VOID_TAGS:
+            self._emit(start)
+            return
+
+        if tag == 'pre':
+            self.pre_depth += 1
+        if tag == 'span':
+            if not rendered:
+                # 没有属性的 span 直接展开，结束标签同样省略
+                self.stack.append((tag, None))
+                return
+            if self.closed_span == start and self.output[-1] == '</span>':
+                self.output.pop()
+                self.closed_span = None
+                self.stack.append((tag, start))
+                return
+        self.stack.append((tag, start))
+        self._emit(start)
+
+    def handle_starttag(self, tag, attrs):
+        self._start(tag, attrs, False)
+
+    def handle_startendtag(self, tag, attrs):
+        self._start(tag, attrs, True)
+
+    def handle_endtag(self, tag):
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index][0] == tag:
+                start = self.stack[index][1]
+                for open_tag, _ in self.stack[index:]:
+                    if open_tag == 'pre':
+                        self.pre_depth -= 1
+                del self.stack[index:]
+                break
+        else:
+            start = f'<{tag}>'
+        if start is None:
+            return
+        self._emit(f'</{tag}>')
+        if tag == 'span':
+            self.closed_span = start
+
+    def handle_data(self, data):
+        if not self.pre_depth:
+            data = WHITESPACE_PATTERN.sub(' ', data)
+            if data == ' ' and (not self.stack or self.stack[-1][0] in BLOCK_CONTAINERS):
+                return
+        if data:
+            self._emit(data)
+
+    def handle_entityref(self, name):
+        self._emit(f'&{name};')
+
+    def handle_charref(self, name):
+        self._emit(f'&#{name};')
+
+    def handle_comment(self, data):
+        pass
+
+    def handle_decl(self, decl):
+        self._emit(f'<!{decl}>')
+
+
+def minify_html(html):
+    """压缩 HTML，渲染效果不变"""
+    minifier = _Minifier()
+    minifier.feed(html)
+    minifier.close()
+    return ''.join(minifier.output)
+
+
+def main():
+    """对 articles/ 下的文章做压缩基准测试"""
+    import time
+    from pathlib import Path
+
+    from css_inliner import CSSInliner
+    from renderer import WeChatRenderer
+
+    renderer = WeChatRenderer()
+    inliner = CSSInliner()
+    total_before = total_after = 0
+    elapsed = 0.0
+    for md_file in sorted(Path('articles').rglob('index.md')):
+        html = inliner.inline(renderer.render(md_file.read_text(encoding='utf-8'))['html'])
+        start = time.perf_counter()
+        minified = minify_html(html)
+        elapsed += time.perf_counter() - start
+        before, after = len(html.encode('utf-8')), len(minified.encode('utf-8'))
+        total_before += before
+        total_after += after
+        print(f"{md_file}: {before} -> {after} 字节 (-{(before - after) / before:.1%})")
+
+    if total_before:
+        print(f"合计: {total_before} -> {total_after} 字节 (-{(total_before - total_after) / total_before:.1%})，"
+              f"压缩耗时 {elapsed * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
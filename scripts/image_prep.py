@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+图片上传前预处理
+按最大宽度缩放并重新编码为体积最小的 JPEG/PNG，满足微信接口的格式与大小限制，处理结果按内容哈希缓存
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+from hashing import file_digest
+
+# media/uploadimg：仅支持 jpg/png，大小不超过1MB
+UPLOADIMG_MAX_BYTES = 1024 * 1024
+# material/add_material?type=thumb：仅支持 jpg，大小不超过64KB
+THUMB_MAX_BYTES = 64 * 1024
+
+MIME_TYPES = {'JPEG': 'image/jpeg', 'PNG': 'image/png'}
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png'}
+
+# source 为缓存中的文件路径，或刚编码完成、仍在内存中的数据，可直接交给 multipart.MultipartEncoder 流式上传
+PreparedImage = namedtuple('PreparedImage', ['filename', 'source', 'mime', 'size'])
+
+
+class ImagePreprocessor:
+    """图片预处理器"""
+
+    def __init__(self, cache_dir, max_width=None, quality=None):
+        self.cache_dir = Path(cache_dir)
+        self.max_width = max_width or int(os.getenv('WECHAT_IMAGE_MAX_WIDTH', '1080'))
+        self.quality = quality or int(os.getenv('WECHAT_IMAGE_QUALITY', '85'))
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, path, max_bytes=UPLOADIMG_MAX_BYTES, formats=('JPEG', 'PNG'), max_width=None):
+        """返回适合上传的图片，结果按源文件哈希和处理参数缓存；命中缓存时不读取文件内容"""
+        path = Path(path)
+        max_width = max_width or self.max_width
+        settings = f"{file_digest(path)}:{max_width}:{self.quality}:{max_bytes}:{','.join(formats)}"
+        key = hashlib.blake2b(settings.encode('utf-8'), digest_size=20).hexdigest()
+        source_size = path.stat().st_size
+
+        for fmt in formats:
+            cached = self.cache_dir / f"{key}{EXTENSIONS[fmt]}"
+            try:
+                size = cached.stat().st_size
+            except FileNotFoundError:
+                continue
+            self._count(source_size, size)
+            return PreparedImage(path.stem + EXTENSIONS[fmt], cached, MIME_TYPES[fmt], size)
+
+        fmt, data = self._encode(path, max_bytes, formats, max_width)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # 多个线程可能同时处理相同内容的图片，各自写入独立的临时文件再原子替换
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.cache_dir / f"{key}{EXTENSIONS[fmt]}")
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        self._count(source_size, len(data))
+        return PreparedImage(path.stem + EXTENSIONS[fmt], data, MIME_TYPES[fmt], len(data))
+
+    def _count(self, source_size, output_size):
+        with self._lock:
+            self.bytes_in += source_size
+            self.bytes_out += output_size
+
+    def _encode(self, path, max_bytes, formats, max_width):
+        """缩放并尝试各格式编码，取满足大小限制的最小结果"""
+        with Image.open(path) as img:
+            source_format = img.format
+            img = ImageOps.exif_transpose(img)
+            resized = img.width > max_width
+            if resized:
+                height = round(img.height * max_width / img.width)
+                img = img.resize((max_width, height), Image.LANCZOS)
+
+            # 源文件已满足要求时直接使用，避免重新编码反而变大
+            source_size = path.stat().st_size
+            candidates = []
+            if not resized and source_format in formats and source_size <= max_bytes:
+                candidates.append((source_format, path.read_bytes()))
+
+            scale = 1.0
+            quality = self.quality
+            while True:
+                current = img
+                if scale < 1.0:
+                    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+                    current = img.resize(size, Image.LANCZOS)
+                for fmt in formats:
+                    data = self._save(current, fmt, quality)
+                    if len(data) <= max_bytes:
+                        candidates.append((fmt, data))
+                if candidates:
+                    return min(candidates, key=lambda c: len(c[1]))
+                # 仍超出限制：先降低质量，再缩小尺寸
+                if quality > 50:
+                    quality -= 15
+                elif scale > 0.2:
+                    scale *= 0.75
+                else:
+                    raise ValueError(f"图片无法压缩到 {max_bytes} 字节以内: {path}")
+
+    def _save(self, img, fmt, quality):
+        buffer = io.BytesIO()
+        if fmt == 'JPEG':
+            if img.mode in ('RGBA', 'LA', 'P'):
+                # 透明背景铺白色，JPEG 不支持透明通道
+                rgba = img.convert('RGBA')
+                background = Image.new('RGB', rgba.size, (255, 255, 255))
+                background.paste(rgba, mask=rgba.getchannel('A'))
+                img = background
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+            img.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+        else:
+            # 颜色数不超过256时无损转为调色板模式，图表类图片体积明显减小
+            if img.mode not in ('P', 'L', '1') and img.getcolors(256) is not None:
+                img = img.convert('P', palette=Image.ADAPTIVE, colors=256)
+            img.save(buffer, 'PNG', optimize=True)
+        return buffer.getvalue()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+运行统计
+按文章记录各阶段耗时（读取、渲染、图片上传、缩略图、草稿、发布），并累计上传字节数等计数，
+运行结束时与接口调用、重试和缓存命中统计一起写入 JSON 运行报告，供 create_summary.py 生成步骤摘要
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+
+RUN_REPORT_PATH = 'run_report.json'
+
+# 当前正在处理的文章：每个线程和每个 asyncio 任务各自独立
+_current_article = ContextVar('current_article', default=None)
+
+# 报告中各阶段的顺序
+STAGES = ('read', 'render', 'images', 'thumb', 'draft', 'publish')
+
+
+def stage_order(stage):
+    """已知阶段按流程顺序排列，其余排在后面"""
+    return (STAGES.index(stage) if stage in STAGES else len(STAGES), stage)
+
+
+class Instrumentation:
+    """线程安全的耗时与计数统计
+
+    文章在哪个线程（或 asyncio 任务）中处理，就在其中用 article() 标记当前文章，其中的 span() 自动归入该文章；
+    跨文章的操作（如批量模式下的多图文草稿）显式传入文章列表
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.articles = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, key):
+        entry = self.articles.get(key)
+        if entry is None:
+            entry = self.articles[key] = {'stages': {}}
+        return entry
+
+    @contextmanager
+    def article(self, key):
+        """标记当前线程或任务正在处理的文章"""
+        token = _current_article.set(key)
+        try:
+            yield
+        finally:
+            _current_article.reset(token)
+
+    @contextmanager
+    def span(self, stage, keys=None):
+        """计时一个阶段，同一阶段多次执行时累加"""
+        if keys is None:
+            current = _current_article.get()
+            keys = [current] if current is not None else []
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                for key in keys:
+                    stages = self._entry(key)['stages']
+                    stages[stage] = stages.get(stage, 0.0) + elapsed
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_result(self, key, **fields):
+        """记录文章的发布结果（标题、状态、错误等）"""
+        with self._lock:
+            self._entry(key).update(fields)
+
+    def report(self, **sections):
+        """生成运行报告；sections 为附加的统计（接口调用、缓存命中等）"""
+        with self._lock:
+            articles = []
+            for key, entry in self.articles.items():
+                stages = entry['stages']
+                article = {name: value for name, value in entry.items() if name != 'stages'}
+                article['file_path'] = key
+                article['stages'] = {stage: round(stages[stage], 4) for stage in sorted(stages, key=stage_order)}
+                article['total'] = round(sum(stages.values()), 4)
+                articles.append(article)
+            counters = dict(self.counters)
+        return dict({
+            'started_at': datetime.fromtimestamp(self.started).isoformat(),
+            'duration': round(time.time() - self.started, 3),
+            'articles': articles,
+            'counters': counters,
+        }, **sections)
+
+    def write(self, path=None, **sections):
+        """写入运行报告，路径默认取 WECHAT_RUN_REPORT"""
+        path = Path(path or os.getenv('WECHAT_RUN_REPORT', RUN_REPORT_PATH))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(**sections), f, indent=2, ensure_ascii=False)
+        return path
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+素材缓存
+以内容哈希为键记录已上传到微信服务器的素材，跨运行持久化到 JSON 文件
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+class MediaCache:
+    """按内容哈希索引的素材缓存，带过期与容量淘汰"""
+
+    def __init__(self, path, max_age_days=180, max_entries=5000):
+        self.path = Path(path)
+        self.max_age = max_age_days * 86400
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.entries = self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  素材缓存读取失败，将重新建立 {self.path}: {e}")
+            return {}
+
+    def get(self, digest):
+        """查询缓存，过期条目视为未命中并移除"""
+        with self._lock:
+            entry = self.entries.get(digest)
+            if entry and time.time() - entry.get('uploaded_at', 0) > self.max_age:
+                del self.entries[digest]
+                self._dirty = True
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            # 最近使用时间只在内存中更新，随其他改动一起写回：缓存文件提交在仓库中，仅命中不应产生新的提交
+            entry['last_used'] = time.time()
+            self.hits += 1
+            return entry
+
+    def peek(self, digest):
+        """查询条目，不计入命中统计，也不更新最近使用时间"""
+        with self._lock:
+            return self.entries.get(digest)
+
+    def put(self, digest, **fields):
+        """写入缓存条目"""
+        now = time.time()
+        with self._lock:
+            self.entries[digest] = dict(fields, uploaded_at=now, last_used=now)
+            self._dirty = True
+
+    def update(self, digest, **fields):
+        """更新已有条目的字段"""
+        with self._lock:
+            if digest in self.entries:
+                self.entries[digest].update(fields)
+                self._dirty = True
+
+    def invalidate(self, digest):
+        """移除失效条目"""
+        with self._lock:
+            if self.entries.pop(digest, None) is not None:
+                self._dirty = True
+
+    def _evict(self):
+        """淘汰过期条目，超出容量时按最近使用时间淘汰"""
+        now = time.time()
+        expired = [k for k, v in self.entries.items() if now - v.get('uploaded_at', 0) > self.max_age]
+        for key in expired:
+            del self.entries[key]
+        overflow = len(self.entries) - self.max_entries
+        if overflow > 0:
+            oldest = sorted(self.entries, key=lambda k: self.entries[k].get('last_used', 0))
+            for key in oldest[:overflow]:
+                del self.entries[key]
+
+    def save(self):
+        """原子写回缓存文件"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._evict()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=2, ensure_ascii=False, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+
+def cache_root():
+    """本地缓存根目录，可通过 HELLOWE_CACHE_DIR 指定（自托管 runner 上跨运行保留）"""
+    return Path(os.path.expanduser(os.getenv('HELLOWE_CACHE_DIR', '~/.cache/hellowe')))
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+本地模拟微信接口
+实现发布流程用到的接口（token、图片上传、缩略图素材、草稿及草稿列表、发布及状态查询），
+可注入延迟和错误率，用于离线压测完整的发布流程：
+
+    python scripts/mock_wechat_server.py --port 8765 --latency 0.05 --error-rate 0.02
+    WECHAT_API_BASE=http://127.0.0.1:8765/cgi-bin python scripts/wechat_publisher.py
+
+MockWeChatAPI 也供 wechat_publisher.py --dry-run 在进程内生成模拟响应
+"""
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from multipart import iter_source
+
+# 与真实接口一致的正文长度限制
+CONTENT_MAX_CHARS = 20000
+DRAFT_MAX_ARTICLES = 8
+
+# 1x1 JPEG，用于 get_material 返回缩略图内容
+TINY_JPEG = bytes.fromhex(
+    'ffd8ffe000104a46494600010100000100010000ffdb004300080606070605080707070909080a0c140d0c0b0b0c1912'
+    '130f141d1a1f1e1d1a1c1c20242e2720222c231c1c2837292c30313434341f27393d38323c2e333432ffc0000b080001'
+    '000101011100ffc4001f0000010501010101010100000000000000000102030405060708090a0bffc400b5100002010303'
+    '020403050504040000017d01020300041105122131410613516107227114328191a1082342b1c11552d1f02433627282'
+    '090a161718191a25262728292a3435363738393a434445464748494a535455565758595a636465666768696a737475767778'
+    '797a838485868788898a92939495969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9bac2c3c4c5c6c7c8c9cad2d3d4'
+    'd5d6d7d8d9dae1e2e3e4e5e6e7e8e9eaf1f2f3f4f5f6f7f8f9faffda0008010100003f00fbd3ffd9'
+)
+
+
+class MockWeChatAPI:
+    """内存中的模拟接口状态，线程安全"""
+
+    def __init__(self, error_rate=0.0, token_ttl=7200):
+        self.error_rate = error_rate
+        self.token_ttl = token_ttl
+        self.tokens = set()
+        self.materials = set()
+        self.drafts = {}
+        self.jobs = {}
+        self.calls = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _next_id(self, prefix):
+        return f"{prefix}_{next(self._ids)}"
+
+    def handle(self, endpoint, query, body):
+        """处理一次调用，返回 (HTTP状态码, 响应体)；响应体为 dict（JSON）或 bytes"""
+        with self._lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            if self.error_rate and random.random() < self.error_rate:
+                return 200, {'errcode': -1, 'errmsg': 'system error'}
+
+            if endpoint == 'token':
+                token = self._next_id('token')
+                self.tokens.add(token)
+                return 200, {'access_token': token, 'expires_in': self.token_ttl}
+            if query.get('access_token') not in self.tokens:
+                return 200, {'errcode': 40001, 'errmsg': 'invalid credential'}
+
+            handler = getattr(self, '_' + endpoint.replace('/', '_'), None)
+            if handler is None:
+                return 404, {'errcode': 404, 'errmsg': f'unknown endpoint {endpoint}'}
+            return handler(query, body)
+
+    def _media_uploadimg(self, query, body):
+        return 200, {'url': f"http://mmbiz.qpic.cn/mock/{self._next_id('img')}/0?wx_fmt=jpeg"}
+
+    def _material_add_material(self, query, body):
+        media_id = self._next_id('thumb')
+        self.materials.add(media_id)
+        return 200, {'media_id': media_id, 'url': f"http://mmbiz.qpic.cn/mock/{media_id}/0"}
+
+    def _material_get_material(self, query, body):
+        if (body or {}).get('media_id') not in self.materials:
+            return 200, {'errcode': 40007, 'errmsg': 'invalid media_id'}
+        return 200, TINY_JPEG
+
+    def _draft_add(self, query, body):
+        articles = (body or {}).get('articles') or []
+        if not articles or len(articles) > DRAFT_MAX_ARTICLES:
+            return 200, {'errcode': 45028, 'errmsg': 'invalid article count'}
+        for article in articles:
+            if article.get('thumb_media_id') not in self.materials:
+                return 200, {'errcode': 40007, 'errmsg': 'invalid media_id'}
+            if len(article.get('content', '')) >= CONTENT_MAX_CHARS:
+                return 200, {'errcode': 45002, 'errmsg': 'content size out of limit'}
+        media_id = self._next_id('draft')
+        self.drafts[media_id] = {'articles': articles, 'update_time': int(time.time())}
+        return 200, {'media_id': media_id}
+
+    def _draft_batchget(self, query, body):
+        body = body or {}
+        offset, count = body.get('offset', 0), body.get('count', 20)
+        # 最近创建的草稿在前
+        media_ids = list(reversed(self.drafts))[offset:offset + count]
+        items = []
+        for media_id in media_ids:
+            draft = self.drafts[media_id]
+            news_items = [
+                {key: value for key, value in article.items() if not (key == 'content' and body.get('no_content'))}
+                for article in draft['articles']
+            ]
+            items.append({'media_id': media_id, 'content': {'news_item': news_items}, 'update_time': draft['update_time']})
+        return 200, {'total_count': len(self.drafts), 'item_count': len(items), 'item': items}
+
+    def _freepublish_submit(self, query, body):
+        media_id = (body or {}).get('media_id')
+        if media_id not in self.drafts:
+            return 200, {'errcode': 40007, 'errmsg': 'invalid media_id'}
+        publish_id = self._next_id('publish')
+        self.jobs[publish_id] = media_id
+        return 200, {'errcode': 0, 'errmsg': 'ok', 'publish_id': publish_id, 'msg_data_id': next(self._ids)}
+
+    def _freepublish_get(self, query, body):
+        publish_id = (body or {}).get('publish_id')
+        if publish_id not in self.jobs:
+            return 200, {'errcode': 48001, 'errmsg': 'invalid publish_id'}
+        count = len(self.drafts[self.jobs[publish_id]]['articles'])
+        items = [{'idx': idx, 'article_url': f"https://mp.weixin.qq.com/s/mock-{publish_id}-{idx}"}
+                 for idx in range(1, count + 1)]
+        return 200, {
+            'publish_id': publish_id,
+            'publish_status': 0,
+            'article_id': f"article_{publish_id}",
+            'article_detail': {'count': count, 'item': items},
+            'fail_idx': []
+        }
+
+
+class DryRunTransport:
+    """离线演练：把每次接口调用的请求写入目录，并由 MockWeChatAPI 生成响应"""
+
+    def __init__(self, output_dir):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.api = MockWeChatAPI()
+        self._seq = itertools.count(1)
+
+    def call(self, endpoint, access_token, query, json_body=None, files=None):
+        """返回与真实接口相同结构的响应 JSON；二进制响应返回空字典"""
+        prefix = f"{next(self._seq):05d}-{endpoint.replace('/', '-')}"
+        if json_body is not None:
+            with open(self.output_dir / f"{prefix}.json", 'w', encoding='utf-8') as f:
+                json.dump(json_body, f, indent=2, ensure_ascii=False)
+            # 草稿正文单独保存为 HTML，便于直接查看渲染结果
+            for index, article in enumerate(json_body.get('articles') or [], 1):
+                (self.output_dir / f"{prefix}-{index}.html").write_text(article.get('content', ''), encoding='utf-8')
+        for filename, source, _ in (files or {}).values():
+            with open(self.output_dir / f"{prefix}-{Path(filename).name}", 'wb') as f:
+                for chunk in iter_source(source):
+                    f.write(chunk)
+
+        params = {key: values[0] for key, values in parse_qs(query).items()}
+        if access_token:
+            params['access_token'] = access_token
+        _, payload = self.api.handle(endpoint, params, json_body)
+        return {} if isinstance(payload, bytes) else payload
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    # 保持连接，与微信接口一致，才能测出连接池的复用效果；每个响应都必须带 Content-Length
+    protocol_version = 'HTTP/1.1'
+    api = None
+    latency = 0.0
+    quiet = True
+
+    def _dispatch(self):
+        parsed = urlparse(self.path)
+        if '/cgi-bin/' not in parsed.path:
+            self.send_error(404)
+            return
+        endpoint = parsed.path.split('/cgi-bin/', 1)[1].strip('/')
+        query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        body = None
+        if raw and self.headers.get('Content-Type', '').startswith('application/json'):
+            body = json.loads(raw.decode('utf-8'))
+
+        if self.latency:
+            time.sleep(random.uniform(0.5, 1.5) * self.latency)
+
+        status, payload = self.api.handle(endpoint, query, body)
+        if isinstance(payload, bytes):
+            content_type = 'image/jpeg'
+        else:
+            content_type = 'application/json; charset=utf-8'
+            payload = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = _dispatch
+    do_POST = _dispatch
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def serve(host='127.0.0.1', port=8765, latency=0.0, error_rate=0.0, quiet=True):
+    """创建模拟服务器（未启动），port 为 0 时自动分配端口"""
+    handler = type('Handler', (MockHandler,), {
+        'api': MockWeChatAPI(error_rate=error_rate),
+        'latency': latency,
+        'quiet': quiet,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟微信公众号接口')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='平均响应延迟（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回 errcode -1（系统繁忙）的比例')
+    parser.add_argument('--verbose', action='store_true', help='打印每个请求')
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.latency, args.error_rate, quiet=not args.verbose)
+    host, port = server.server_address[:2]
+    print(f"🧪 模拟微信接口已启动: http://{host}:{port}/cgi-bin")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"接口调用次数: {server.RequestHandlerClass.api.calls}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+发布状态存储
+使用标准库 sqlite3 保存已发布记录，每篇文章单独提交事务；
+config/published.json 与 config/publish_state.json 作为导出文件保留在 Git 历史中
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from media_cache import cache_root
+
+PUBLISHED_JSON = Path('config/published.json')
+STATE_JSON = Path('config/publish_state.json')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    path TEXT PRIMARY KEY,
+    content_hash,
+    published_time TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_articles_hash ON articles(content_hash);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def default_db_path():
+    """数据库位置：默认放在本地缓存目录（自托管 runner 上跨运行保留，不受 git clean 影响）"""
+    if os.getenv('HELLOWE_STATE_DB'):
+        return Path(os.path.expanduser(os.getenv('HELLOWE_STATE_DB')))
+    repo = os.getenv('GITHUB_REPOSITORY', 'local').replace('/', '_')
+    return cache_root() / f'publish_state-{repo}.db'
+
+
+class PublishStateStore:
+    """已发布记录与发布进度"""
+
+    def __init__(self, db_path=None, json_path=PUBLISHED_JSON, state_path=STATE_JSON):
+        self.db_path = Path(db_path or default_db_path())
+        self.json_path = Path(json_path)
+        self.state_path = Path(state_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        self._import_json()
+
+    def _import_json(self):
+        """合并 Git 中的导出文件：数据库缺少或更旧的记录以 JSON 为准"""
+        if self.json_path.exists():
+            with open(self.json_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            with self._lock, self.conn:
+                for path, record in records.items():
+                    row = self.conn.execute(
+                        'SELECT published_time FROM articles WHERE path = ?', (path,)
+                    ).fetchone()
+                    if row is None or (row[0] or '') < (record.get('published_time') or ''):
+                        self._upsert(path, record)
+
+        if self.state_path.exists():
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            for key, value in state.items():
+                if self.get_meta(key) is None:
+                    self.set_meta(key, value)
+
+    def _upsert(self, path, record):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO articles (path, content_hash, published_time, record) VALUES (?, ?, ?, ?)',
+            (path, record.get('content_hash'), record.get('published_time'), json.dumps(record, ensure_ascii=False))
+        )
+
+    def get(self, path):
+        """按文章路径查询记录"""
+        with self._lock:
+            row = self.conn.execute('SELECT record FROM articles WHERE path = ?', (path,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def __contains__(self, path):
+        with self._lock:
+            return self.conn.execute('SELECT 1 FROM articles WHERE path = ?', (path,)).fetchone() is not None
+
+    def find_by_hash(self, content_hash):
+        """按内容摘要查询文章路径（走 content_hash 索引）"""
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT path FROM articles WHERE content_hash = ? ORDER BY path', (content_hash,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def put(self, path, record):
+        """写入一篇文章的记录并立即提交"""
+        with self._lock, self.conn:
+            self._upsert(path, record)
+
+    def update(self, path, **fields):
+        """更新记录中的部分字段"""
+        with self._lock, self.conn:
+            row = self.conn.execute('SELECT record FROM articles WHERE path = ?', (path,)).fetchone()
+            if row is None:
+                return
+            record = json.loads(row[0])
+            record.update(fields)
+            self._upsert(path, record)
+
+    def rename(self, old_path, new_path):
+        """文章重命名时迁移记录"""
+        with self._lock, self.conn:
+            self.conn.execute('UPDATE articles SET path = ? WHERE path = ?', (new_path, old_path))
+
+    def legacy_hash_paths(self):
+        """仍使用旧版整数哈希的文章"""
+        with self._lock:
+            rows = self.conn.execute("SELECT path FROM articles WHERE typeof(content_hash) = 'integer'").fetchall()
+        return [row[0] for row in rows]
+
+    def all(self):
+        """全部记录 {路径: 记录}"""
+        with self._lock:
+            rows = self.conn.execute('SELECT path, record FROM articles ORDER BY path').fetchall()
+        return {path: json.loads(record) for path, record in rows}
+
+    def get_meta(self, key):
+        with self._lock:
+            row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_meta(self, key, value):
+        with self._lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, json.dumps(value, ensure_ascii=False))
+            )
+
+    def export_json(self):
+        """导出为 JSON 文件，供提交到 Git"""
+        self.json_path.parent.mkdir(exist_ok=True)
+        with open(self.json_path, 'w', encoding='utf-8') as f:
+            json.dump(self.all(), f, indent=2, ensure_ascii=False)
+
+        with self._lock:
+            rows = self.conn.execute('SELECT key, value FROM meta ORDER BY key').fetchall()
+        if rows:
+            with open(self.state_path, 'w', encoding='utf-8') as f:
+                json.dump({key: json.loads(value) for key, value in rows}, f, indent=2, ensure_ascii=False)
+
+    def close(self):
+        self.conn.close()
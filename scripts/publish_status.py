@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+发布状态跟踪
+freepublish/submit 只返回 publish_id，任务在微信后台异步执行。
+后台线程并发轮询 freepublish/get，按任务自适应退避，把最终状态和文章链接写回发布记录
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# freepublish/get 返回的 publish_status
+PUBLISH_STATUS = {
+    0: 'success',
+    1: 'publishing',
+    2: 'original_failed',
+    3: 'failed',
+    4: 'rejected',
+    5: 'deleted',
+    6: 'banned',
+}
+PUBLISHING = 'publishing'
+SUCCESS = 'success'
+
+
+class _Job:
+    __slots__ = ('publish_id', 'targets', 'delay', 'due', 'errors')
+
+    def __init__(self, publish_id, delay):
+        self.publish_id = publish_id
+        # [(文章路径, 分篇序号或None, 草稿中的位置 idx)]
+        self.targets = []
+        self.delay = delay
+        self.due = time.monotonic() + delay
+        self.errors = 0
+
+
+class PublishStatusTracker:
+    """在后台线程中轮询发布任务，不阻塞发布流程"""
+
+    def __init__(self, fetch, store, workers=4, initial_delay=1.0, max_delay=30.0, max_errors=5):
+        self.fetch = fetch
+        self.store = store
+        self.workers = workers
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.max_errors = max_errors
+        self.jobs = {}
+        self.results = {}
+        self._cond = threading.Condition()
+        self._closing = False
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='publish-status', daemon=True)
+        self._thread.start()
+
+    def track(self, publish_id, path, part=None, article_idx=1):
+        """登记一个发布任务；同一 publish_id 可对应多图文草稿中的多篇文章"""
+        if not publish_id:
+            return
+        with self._cond:
+            job = self.jobs.get(publish_id)
+            if job is None:
+                job = self.jobs[publish_id] = _Job(publish_id, self.initial_delay)
+            job.targets.append((path, part, article_idx))
+            self._cond.notify()
+
+    def track_record(self, path, record):
+        """按发布记录登记其中尚未得到结果的发布任务"""
+        if 'parts' in record:
+            for index, part in enumerate(record['parts']):
+                if part.get('publish_status') in (None, PUBLISHING):
+                    self.track(part.get('publish_id'), path, index, part.get('article_idx', 1))
+        elif record.get('publish_status') in (None, PUBLISHING):
+            self.track(record.get('publish_id'), path, None, record.get('article_idx', 1))
+
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                with self._cond:
+                    while True:
+                        if self._stopped or (self._closing and not self.jobs):
+                            return
+                        now = time.monotonic()
+                        due = [job for job in self.jobs.values() if job.due <= now]
+                        if due:
+                            break
+                        wait = min((job.due for job in self.jobs.values()), default=now + 1.0) - now
+                        self._cond.wait(timeout=max(wait, 0.01))
+
+                # 到期的任务并发查询
+                for job, outcome in zip(due, executor.map(self._fetch, due)):
+                    self._handle(job, outcome)
+
+    def _fetch(self, job):
+        try:
+            return self.fetch(job.publish_id)
+        except Exception as e:
+            return e
+
+    def _handle(self, job, outcome):
+        if isinstance(outcome, Exception):
+            job.errors += 1
+            if job.errors < self.max_errors:
+                self._reschedule(job)
+                return
+            print(f"⚠️  查询发布状态失败 publish_id={job.publish_id}: {outcome}")
+            self._finish(job, PUBLISHING, {})
+            return
+
+        status = PUBLISH_STATUS.get(outcome.get('publish_status'), f"unknown_{outcome.get('publish_status')}")
+        if status == PUBLISHING:
+            self._reschedule(job)
+            return
+
+        urls = {
+            item.get('idx'): item.get('article_url')
+            for item in (outcome.get('article_detail') or {}).get('item', [])
+        }
+        if status == SUCCESS:
+            print(f"📬 发布完成 publish_id={job.publish_id}")
+        else:
+            print(f"❌ 发布未成功 publish_id={job.publish_id}: {status} {outcome.get('fail_idx', '')}")
+        self._finish(job, status, urls)
+
+    def _reschedule(self, job):
+        """仍在发布中：逐步拉长轮询间隔"""
+        with self._cond:
+            job.due = time.monotonic() + job.delay
+            job.delay = min(job.delay * 2, self.max_delay)
+
+    def _finish(self, job, status, urls):
+        for path, part, article_idx in job.targets:
+            self._apply(path, part, status, urls.get(article_idx))
+        with self._cond:
+            self.jobs.pop(job.publish_id, None)
+            self.results[job.publish_id] = status
+            self._cond.notify_all()
+
+    def _apply(self, path, part, status, url):
+        """写回发布记录；分篇发布的文章汇总各篇状态"""
+        record = self.store.get(path)
+        if record is None:
+            return
+        if part is None:
+            self.store.update(path, publish_status=status, article_url=url)
+            return
+        parts = record['parts']
+        parts[part].update(publish_status=status, article_url=url)
+        statuses = [p.get('publish_status') or PUBLISHING for p in parts]
+        overall = next((s for s in statuses if s != SUCCESS), SUCCESS)
+        self.store.update(path, parts=parts, publish_status=overall, article_url=parts[0].get('article_url'))
+
+    def close(self, timeout=None):
+        """等待未完成的任务，超时后停止轮询；返回 {状态: 任务数}"""
+        if timeout is None:
+            timeout = float(os.getenv('WECHAT_PUBLISH_WAIT', '60'))
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            while self.jobs:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(timeout=remaining)
+            self._stopped = True
+            self._cond.notify_all()
+        # 等待正在进行的查询结束，之后只有当前线程访问任务表
+        self._thread.join(timeout=60)
+
+        # 超时仍未完成的任务记为发布中，下次运行继续跟踪
+        for job in list(self.jobs.values()):
+            for path, part, _ in job.targets:
+                self._apply(path, part, PUBLISHING, None)
+            self.results[job.publish_id] = PUBLISHING
+        self.jobs.clear()
+
+        summary = {}
+        for status in self.results.values():
+            summary[status] = summary.get(status, 0) + 1
+        return summary
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+微信接口限流
+按接口维护令牌桶，替代固定的 time.sleep 间隔
+"""
+
+import asyncio
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+# 各接口默认速率（次/秒），未列出的接口使用 DEFAULT_RATE
+DEFAULT_RATE = 10.0
+ENDPOINT_RATES = {
+    'draft/add': 2.0,
+    'freepublish/submit': 1.0,
+}
+
+
+class TokenBucket:
+    """线程安全的令牌桶"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """尝试取出一个令牌：成功返回 0，否则返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            delay = (1 - self.tokens) / self.rate
+            self.waited += delay
+            return delay
+
+    def acquire(self):
+        """取出一个令牌，不足时阻塞等待"""
+        while True:
+            delay = self.reserve()
+            if not delay:
+                return
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """取出一个令牌，不足时让出事件循环等待"""
+        while True:
+            delay = self.reserve()
+            if not delay:
+                return
+            await asyncio.sleep(delay)
+
+
+def endpoint_of(url):
+    """从请求URL提取接口名，如 https://api.weixin.qq.com/cgi-bin/draft/add -> draft/add"""
+    path = urlparse(url).path
+    if '/cgi-bin/' in path:
+        path = path.split('/cgi-bin/', 1)[1]
+    return path.strip('/')
+
+
+def parse_rates(spec):
+    """解析 "draft/add=2,freepublish/submit=0.5" 形式的速率配置"""
+    rates = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        endpoint, rate = item.split('=', 1)
+        rates[endpoint.strip().strip('/')] = float(rate)
+    return rates
+
+
+class RateLimiter:
+    """按接口分桶的限流器"""
+
+    def __init__(self, default_rate=None, rates=None):
+        self.default_rate = default_rate or float(os.getenv('WECHAT_RATE_DEFAULT', DEFAULT_RATE))
+        self.rates = dict(ENDPOINT_RATES)
+        self.rates.update(parse_rates(os.getenv('WECHAT_RATE_LIMITS')) if rates is None else rates)
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, endpoint):
+        with self._lock:
+            if endpoint not in self.buckets:
+                self.buckets[endpoint] = TokenBucket(self.rates.get(endpoint, self.default_rate))
+            return self.buckets[endpoint]
+
+    def acquire(self, url):
+        """请求前调用，按接口限流"""
+        self.bucket(endpoint_of(url)).acquire()
+
+    async def acquire_async(self, url):
+        """异步客户端请求前调用，按接口限流"""
+        await self.bucket(endpoint_of(url)).acquire_async()
+
+    def stats(self):
+        """各接口累计等待时间（秒）"""
+        with self._lock:
+            return {endpoint: round(bucket.waited, 3) for endpoint, bucket in self.buckets.items()}
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Markdown 渲染缓存
+以 Markdown 内容、扩展配置和渲染器版本为键缓存渲染结果（图片占位符未替换），磁盘占用超限时按最近使用淘汰
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+
+class RenderCache:
+    """基于目录的 LRU 渲染缓存，每个条目一个 JSON 文件，以 mtime 记录最近使用时间；可在多个线程中使用"""
+
+    def __init__(self, cache_dir, max_bytes=None):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes or int(float(os.getenv('WECHAT_RENDER_CACHE_MB', '64')) * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.total_bytes = sum(p.stat().st_size for p in self.cache_dir.glob('*.json'))
+
+    @staticmethod
+    def make_key(*parts):
+        """由渲染输入和配置生成缓存键"""
+        h = hashlib.blake2b(digest_size=20)
+        for part in parts:
+            h.update(part.encode('utf-8') if isinstance(part, str) else json.dumps(part, sort_keys=True).encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def get(self, key):
+        path = self.cache_dir / f'{key}.json'
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        path = self.cache_dir / f'{key}.json'
+        # 相同内容的文章可能在多个线程中同时写入，各自使用独立的临时文件
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False)
+            size = os.path.getsize(tmp_path)
+            # 替换与占用统计放在同一个锁内，被替换条目的大小不会重复扣减
+            with self._lock:
+                old_size = path.stat().st_size if path.exists() else 0
+                os.replace(tmp_path, path)
+                self.total_bytes += size - old_size
+                if self.total_bytes > self.max_bytes:
+                    self._evict()
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    def _evict(self):
+        """删除最久未使用的条目，直到占用降到上限的90%；调用方持有锁"""
+        entries = sorted(self.cache_dir.glob('*.json'), key=lambda p: p.stat().st_mtime)
+        target = self.max_bytes * 0.9
+        for path in entries:
+            if self.total_bytes <= target:
+                break
+            try:
+                size = path.stat().st_size
+                path.unlink()
+            except OSError:
+                continue
+            self.total_bytes -= size
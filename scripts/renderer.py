@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+微信公众号 Markdown 渲染器
+长期持有一个 markdown.Markdown 实例，文档之间 reset() 复用；
+图片占位、引用、章节分隔符和表格容器都以 Markdown 扩展实现，一次转换完成
+"""
+
+import re
+import threading
+import xml.etree.ElementTree as etree
+
+import markdown
+import pygments
+from markdown.blockprocessors import BlockProcessor
+from markdown.extensions import Extension
+from markdown.inlinepatterns import InlineProcessor
+from markdown.treeprocessors import Treeprocessor
+
+# 渲染器版本：修改扩展、后处理或样式时递增，使旧的渲染缓存失效
+RENDERER_VERSION = f"5:markdown-{markdown.__version__}:pygments-{pygments.__version__}"
+
+MARKDOWN_EXTENSIONS = ['codehilite', 'tables', 'toc', 'fenced_code']
+MARKDOWN_EXTENSION_CONFIGS = {
+    'codehilite': {
+        'css_class': 'highlight',
+        'use_pygments': True
+    }
+}
+
+# 渲染结果中图片地址的占位符
+IMAGE_PLACEHOLDER = 'wximg:'
+# 匹配整个图片容器，容器和图片上可能已内联样式
+IMAGE_PLACEHOLDER_PATTERN = re.compile(
+    r'<div[^>]*><img src="' + IMAGE_PLACEHOLDER + r'(\d+)"[^>]*><div[^>]*>.*?</div></div>'
+)
+IMAGE_PATTERN = r'!\[(.*?)\]\((.*?)\)'
+
+
+def image_container(src, alt):
+    """图片容器HTML"""
+    return f'<div class="img-container"><img src="{src}" alt="{alt}"><div class="img-caption">{alt}</div></div>'
+
+
+class ImagePlaceholderProcessor(InlineProcessor):
+    """图片替换为带占位符的图片容器，实际地址在上传后填入"""
+
+    def __init__(self, pattern, md, extension):
+        super().__init__(pattern, md)
+        self.extension = extension
+
+    def handleMatch(self, m, data):
+        images = self.extension.images
+        images.append([m.group(1), m.group(2)])
+        html = image_container(f'{IMAGE_PLACEHOLDER}{len(images) - 1}', m.group(1))
+        # 作为原始HTML存放，独占一行时不会被包进 <p>
+        return self.md.htmlStash.store(html), m.start(0), m.end(0)
+
+
+class QuoteLineProcessor(BlockProcessor):
+    """以 "> " 开头的每一行单独转换为 <blockquote>，其余行保留为段落"""
+
+    RE = re.compile(r'^> ', re.MULTILINE)
+
+    def test(self, parent, block):
+        return bool(self.RE.search(block))
+
+    def run(self, parent, blocks):
+        paragraph = []
+        for line in blocks.pop(0).split('\n'):
+            if line.startswith('> '):
+                self._flush(parent, paragraph)
+                etree.SubElement(parent, 'blockquote').text = line[2:]
+            else:
+                paragraph.append(line)
+        self._flush(parent, paragraph)
+
+    @staticmethod
+    def _flush(parent, lines):
+        if lines:
+            etree.SubElement(parent, 'p').text = '\n'.join(lines).strip()
+            lines.clear()
+
+
+class SectionDividerProcessor(BlockProcessor):
+    """单独一行的 --- 转换为章节分隔符"""
+
+    def test(self, parent, block):
+        return block.strip() == '---'
+
+    def run(self, parent, blocks):
+        blocks.pop(0)
+        divider = etree.SubElement(parent, 'div', {'class': 'section-divider'})
+        etree.SubElement(divider, 'span').text = '◆ ◆ ◆'
+
+
+class TableContainerProcessor(Treeprocessor):
+    """为表格添加可横向滚动的容器"""
+
+    def run(self, root):
+        # 先收集再修改，避免遍历时重复包裹刚移入容器的表格
+        tables = [(parent, child) for parent in root.iter() for child in parent if child.tag == 'table']
+        for parent, table in tables:
+            index = list(parent).index(table)
+            container = etree.Element('div', {'class': 'table-container'})
+            container.tail, table.tail = table.tail, None
+            parent.remove(table)
+            container.append(table)
+            parent.insert(index, container)
+
+
+class WeChatExtension(Extension):
+    """微信公众号排版扩展"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.images = []
+
+    def extendMarkdown(self, md):
+        md.registerExtension(self)
+        md.inlinePatterns.register(ImagePlaceholderProcessor(IMAGE_PATTERN, md, self), 'wechat_image', 155)
+        md.parser.blockprocessors.register(SectionDividerProcessor(md.parser), 'wechat_divider', 55)
+        md.parser.blockprocessors.register(QuoteLineProcessor(md.parser), 'wechat_quote', 25)
+        md.treeprocessors.register(TableContainerProcessor(md), 'wechat_table', 15)
+
+    def reset(self):
+        self.images = []
+
+
+class WeChatRenderer:
+    """可复用的渲染器，线程安全"""
+
+    def __init__(self):
+        self.extension = WeChatExtension()
+        self.md = markdown.Markdown(
+            extensions=MARKDOWN_EXTENSIONS + [self.extension],
+            extension_configs=MARKDOWN_EXTENSION_CONFIGS
+        )
+        self._lock = threading.Lock()
+
+    def render(self, markdown_content):
+        """渲染Markdown，返回 {'html': ..., 'images': [[alt, path], ...]}，图片地址为占位符"""
+        with self._lock:
+            self.md.reset()
+            html = self.md.convert(markdown_content)
+            images = self.extension.images
+        return {'html': f'<div class="content">{html}</div>', 'images': images}
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+微信接口重试策略
+按 errcode 区分可重试、token失效和致命错误，指数退避加随机抖动，整次运行共享重试预算
+"""
+
+import os
+import random
+import threading
+
+RETRYABLE = 'retryable'
+TOKEN_EXPIRED = 'token_expired'
+FATAL = 'fatal'
+# 请求可能已被服务器处理（读取超时、连接中断、5xx），结果未知
+UNCERTAIN = 'uncertain'
+
+# -1 系统繁忙；45009/45011 接口调用频率超限
+RETRYABLE_ERRCODES = {-1, 45009, 45011}
+# 40001 凭证无效；40014 access_token 不合法；42001 access_token 过期
+TOKEN_ERRCODES = {40001, 40014, 42001}
+# 非幂等接口：请求已被处理后再次发送会产生重复的草稿或再次群发
+NON_IDEMPOTENT_ENDPOINTS = {'draft/add', 'freepublish/submit'}
+
+
+class WeChatAPIError(Exception):
+    """微信接口返回的业务错误"""
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result or {}
+        self.errcode = self.result.get('errcode')
+
+
+def classify_errcode(errcode):
+    """将微信 errcode 归类"""
+    if errcode in TOKEN_ERRCODES:
+        return TOKEN_EXPIRED
+    if errcode in RETRYABLE_ERRCODES:
+        return RETRYABLE
+    return FATAL
+
+
+def classify_transport_error(endpoint, sent):
+    """网络错误和 5xx 的归类：请求未发出或接口幂等时可重试，否则结果未知"""
+    if not sent or endpoint not in NON_IDEMPOTENT_ENDPOINTS:
+        return RETRYABLE
+    return UNCERTAIN
+
+
+class RetryPolicy:
+    """重试策略：单次调用的重试上限、退避参数与整次运行的重试预算"""
+
+    def __init__(self, max_retries=None, base_delay=0.5, max_delay=8.0, budget=None):
+        self.max_retries = int(os.getenv('WECHAT_RETRY_MAX', '3')) if max_retries is None else max_retries
+        self.budget = int(os.getenv('WECHAT_RETRY_BUDGET', '30')) if budget is None else budget
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt):
+        """第 attempt 次重试前的等待时间（full jitter）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def record_call(self, endpoint):
+        with self._lock:
+            entry = self.stats.setdefault(endpoint, {'calls': 0, 'retries': 0, 'failures': 0})
+            entry['calls'] += 1
+
+    def record_failure(self, endpoint):
+        with self._lock:
+            self.stats[endpoint]['failures'] += 1
+
+    def allow_retry(self, endpoint, attempt):
+        """是否还能重试：单次调用未超上限且运行预算未耗尽"""
+        with self._lock:
+            if attempt >= self.max_retries or self.budget <= 0:
+                return False
+            self.budget -= 1
+            self.stats[endpoint]['retries'] += 1
+            return True
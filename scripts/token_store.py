@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+access_token 文件缓存
+多个进程/多次运行之间共享 access_token，文件锁保证同一时间只有一个进程刷新
+"""
+
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileTokenStore:
+    """基于 JSON 文件的 access_token 存储，按 AppID 区分"""
+
+    def __init__(self, path):
+        self.path = Path(os.path.expanduser(str(path)))
+        self.lock_path = self.path.with_suffix(self.path.suffix + '.lock')
+
+    @contextmanager
+    def locked(self):
+        """独占文件锁，持锁期间完成读取或刷新"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, 'a+') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _read_all(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self, app_id):
+        """返回 (access_token, 过期时间戳)，不存在时返回 (None, 0)"""
+        entry = self._read_all().get(app_id) or {}
+        return entry.get('access_token'), entry.get('expires_at', 0)
+
+    def save(self, app_id, access_token, expires_at):
+        """写入 token，文件权限仅限当前用户"""
+        data = self._read_all()
+        data[app_id] = {'access_token': access_token, 'expires_at': expires_at}
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def invalidate(self, app_id, access_token):
+        """token 被微信判定失效时移除（仅当仍是同一个 token）"""
+        with self.locked():
+            stored, _ = self.load(app_id)
+            if stored == access_token:
+                self.save(app_id, None, 0)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+微信接口调用的公共部分
+请求编码、响应检查、重试判断和非幂等接口的结果核对，不涉及 I/O；
+同步发布器（wechat_publisher.py）与异步客户端（async_publisher.py）各自发送请求，共用这里的规则
+"""
+
+import json
+
+from multipart import MultipartEncoder
+from retry import FATAL, WeChatAPIError, classify_errcode
+
+# 创建草稿结果未知时，在最近的多少个草稿中查找是否已经创建
+DRAFT_LOOKUP_COUNT = 20
+DRAFT_CLOCK_SKEW = 60
+
+
+def encode_request(json_body, files):
+    """请求体与请求头，返回 (data, headers)"""
+    if json_body is not None:
+        # 明确设置编码以避免中文乱码
+        return json.dumps(json_body, ensure_ascii=False).encode('utf-8'), {'Content-Type': 'application/json; charset=utf-8'}
+    if files:
+        # 流式上传：请求体发送时按块读取，每次重试重新迭代
+        data = MultipartEncoder(files)
+        return data, {'Content-Type': data.content_type}
+    return None, None
+
+
+def api_url(api_base, endpoint, access_token, query):
+    params = [f"access_token={access_token}"] if access_token else []
+    if query:
+        params.append(query)
+    return f"{api_base}/{endpoint}?{'&'.join(params)}"
+
+
+def check_result(result, expect, error_prefix):
+    """检查响应JSON，成功时返回 None，否则返回 (错误, 错误类别)"""
+    # 成功时没有errcode字段或errcode为0，失败时errcode非0
+    if result.get('errcode', 0) == 0 and (expect is None or expect in result):
+        return None
+    return WeChatAPIError(f"{error_prefix}: {result}", result), classify_errcode(result.get('errcode'))
+
+
+def retry_delay(retry, endpoint, attempt, error, kind):
+    """一次调用失败后：不可重试时抛出错误，否则返回重试前的等待时间（token 失效由调用方先行丢弃）"""
+    if kind == FATAL or not retry.allow_retry(endpoint, attempt):
+        retry.record_failure(endpoint)
+        raise error
+
+    delay = retry.backoff(attempt)
+    print(f"🔁 {endpoint} 第{attempt + 1}次重试（{delay:.1f}s后）: {error}")
+    return delay
+
+
+def can_reconcile(endpoint):
+    """非幂等接口结果未知时能否核对：草稿可在草稿列表中查找；发布无法确认，不再重试，避免再次群发"""
+    if endpoint == 'draft/add':
+        return True
+    print(f"⚠️  {endpoint} 结果未知，为避免重复执行不再重试")
+    return False
+
+
+def draft_lookup_body():
+    return {"offset": 0, "count": DRAFT_LOOKUP_COUNT, "no_content": 1}
+
+
+def match_created_draft(drafts, articles, sent_at):
+    """在 draft/batchget 的结果中查找请求发出后创建、文章标题依次相同的草稿"""
+    titles = [article['title'] for article in articles]
+    for item in drafts.get('item') or []:
+        news_items = (item.get('content') or {}).get('news_item') or []
+        # 容忍本机与微信服务器之间的时钟偏差
+        if item.get('update_time', 0) >= sent_at - DRAFT_CLOCK_SKEW and [news.get('title') for news in news_items] == titles:
+            print(f"✅ 草稿已创建，不再重试，media_id: {item['media_id']}")
+            return {'media_id': item['media_id']}
+    return None
@@ -1,21 +1,183 @@
 #!/usr/bin/env python3
+import argparse
 import os
 import json
 import requests
-import markdown
 import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
+from html import escape as html_escape
+
+from content_budget import ContentBudget
+from css_inliner import CSSInliner
+from detect_changes import get_head_commit, record_published_commit
+from hashing import file_digest
+from html_minifier import minify_html
+from image_prep import THUMB_MAX_BYTES, ImagePreprocessor
+from instrumentation import Instrumentation
+from media_cache import MediaCache, cache_root
+from mock_wechat_server import DryRunTransport
+from publish_state import PublishStateStore
+from publish_status import PUBLISHING, PublishStatusTracker
+from rate_limit import RateLimiter
+from retry import FATAL, RETRYABLE, TOKEN_EXPIRED, UNCERTAIN, RetryPolicy, WeChatAPIError, classify_transport_error
+from render_cache import RenderCache
+from renderer import (
+    IMAGE_PLACEHOLDER, IMAGE_PLACEHOLDER_PATTERN, MARKDOWN_EXTENSION_CONFIGS, MARKDOWN_EXTENSIONS,
+    RENDERER_VERSION, WeChatRenderer
+)
+from token_store import FileTokenStore
+from wechat_api import (
+    api_url, can_reconcile, check_result, draft_lookup_body, encode_request, match_created_draft, retry_delay
+)
+from wechat_session import WeChatSession, request_sent
+
+DEFAULT_API_BASE = 'https://api.weixin.qq.com/cgi-bin'
+
+# 一个草稿最多包含的文章数
+DRAFT_MAX_ARTICLES = 8
+
+# 文章目录中按顺序查找的缩略图文件，都没有时使用默认缩略图
+THUMB_NAMES = ['thumb.jpg', 'thumb.jpeg', 'thumb.png', 'cover.jpg', 'cover.png']
+DEFAULT_THUMB_PATH = Path(__file__).parent.parent / 'config' / 'default_thumb.jpg'
+
+# 草稿已创建但自动发布失败，需在公众平台后台手动发布
+MANUAL_PUBLISH_REQUIRED = 'draft_created_manual_publish_required'
+
+# 批量模式下文章合并进草稿的顺序
+BATCH_ORDERS = {
+    'input': None,
+    'path': lambda article: article['file_path'],
+    'title': lambda article: article['title'],
+    'mtime': lambda article: article.get('modified_time', 0),
+}
+
+
+def sort_articles(articles, order):
+    """按批量顺序排列待发布文章，input 保持 to_publish.json 中的顺序"""
+    key = BATCH_ORDERS[order]
+    return list(articles) if key is None else sorted(articles, key=key)
+
+
+def plan_batches(prepared, batch_size):
+    """把各文章的分篇装入草稿，返回 [[(文章序号, 分篇), ...], ...]
+    
+    同一篇文章的分篇保持相邻且有序，放不进当前草稿时整篇移到下一个草稿
+    """
+    groups = []
+    current = []
+    for index, parts in enumerate(prepared):
+        items = [(index, part) for part in parts]
+        if current and len(current) + len(items) > batch_size:
+            groups.append(current)
+            current = []
+        while len(items) > batch_size:
+            groups.append(items[:batch_size])
+            items = items[batch_size:]
+        current.extend(items)
+    if current:
+        groups.append(current)
+    return groups
+
+
+class DraftBatches:
+    """批量模式的草稿编排：按 plan_batches 分组，汇总各文章的草稿与发布结果
+    
+    只负责记账，草稿创建和发布由同步或异步发布器执行
+    """
+    
+    def __init__(self, articles, prepared, batch_size):
+        # prepared 与 articles 一一对应：分篇列表，或准备失败时的异常
+        self.failures = [(article, parts) for article, parts in zip(articles, prepared) if isinstance(parts, Exception)]
+        self.prepared = [(article, parts) for article, parts in zip(articles, prepared) if not isinstance(parts, Exception)]
+        self.batch_size = batch_size
+        self.results = {index: [] for index in range(len(self.prepared))}
+        self.remaining = {index: len(parts) for index, (_, parts) in enumerate(self.prepared)}
+        self.statuses = {}
+        self.failed = set()
+    
+    def groups(self):
+        """依次产出 (分组, 分篇列表, 文章键)；已失败文章的其余分篇跳过"""
+        for group in plan_batches([parts for _, parts in self.prepared], self.batch_size):
+            group = [(index, part) for index, part in group if index not in self.failed]
+            if not group:
+                continue
+            print(f"\n📦 创建多图文草稿: {', '.join(part['article']['title'] for _, part in group)}")
+            # 草稿和发布的耗时计入其中每一篇文章
+            keys = list(dict.fromkeys(self.prepared[index][0]['file_path'] for index, _ in group))
+            yield group, [part for _, part in group], keys
+    
+    def fail(self, group, error):
+        """草稿创建失败：组内文章都记为失败，产出 (文章, 异常)"""
+        for index in dict.fromkeys(index for index, _ in group):
+            self.failed.add(index)
+            yield self.prepared[index][0], error
+    
+    def done(self, group, media_id, publish_id, status):
+        """草稿已创建并发布：产出所有分篇都已完成的 (文章, 发布结果)"""
+        for article_idx, (index, _) in enumerate(group, 1):
+            self.results[index].append({'media_id': media_id, 'publish_id': publish_id, 'article_idx': article_idx})
+            self.statuses[index] = self.statuses.get(index) or status
+            self.remaining[index] -= 1
+            if self.remaining[index] == 0:
+                yield self.prepared[index][0], WeChatPublisher.publish_result(self.results[index], self.statuses[index])
+
 
 class WeChatPublisher:
-    def __init__(self):
-        self.app_id = os.getenv('WECHAT_APP_ID')
-        self.app_secret = os.getenv('WECHAT_APP_SECRET')
+    def __init__(self, dry_run_dir=None):
+        # 离线演练：请求写入目录，由本地模拟接口生成响应，不访问微信服务器
+        self.dry_run = DryRunTransport(dry_run_dir) if dry_run_dir else None
+        self.app_id = os.getenv('WECHAT_APP_ID') or ('dry-run' if self.dry_run else None)
+        self.app_secret = os.getenv('WECHAT_APP_SECRET') or ('dry-run' if self.dry_run else None)
+        # 接口地址，可指向本地模拟服务器（scripts/mock_wechat_server.py）
+        self.api_base = os.getenv('WECHAT_API_BASE', DEFAULT_API_BASE).rstrip('/')
         self.author = os.getenv('AUTHOR_NAME', '')
         self.source_url = os.getenv('SOURCE_URL', '')
         self.access_token = None
         self.access_token_expires = 0
+        self._token_lock = threading.Lock()
+        # 可选的access_token文件缓存，供多个进程和多次运行共享
+        token_cache = None if self.dry_run else os.getenv('WECHAT_TOKEN_CACHE')
+        self.token_store = FileTokenStore(token_cache) if token_cache else None
+        # 图片并发上传的线程数，需兼顾微信接口频率限制
+        self.upload_workers = max(1, int(os.getenv('WECHAT_UPLOAD_WORKERS', '8')))
+        self.publish_workers = max(1, int(os.getenv('WECHAT_PUBLISH_WORKERS', '3')))
+        # 批量模式：多篇文章合并为一个多图文草稿，1 表示每篇单独发布
+        self.batch_size = min(max(1, int(os.getenv('WECHAT_BATCH_SIZE', '1'))), DRAFT_MAX_ARTICLES)
+        self.batch_order = os.getenv('WECHAT_BATCH_ORDER', 'input')
+        if self.batch_order not in BATCH_ORDERS:
+            raise ValueError(f"WECHAT_BATCH_ORDER 必须是 {', '.join(BATCH_ORDERS)} 之一")
+        # 整个发布过程共用一个连接池，避免每次请求重新握手；按接口令牌桶限流
+        self.rate_limiter = RateLimiter()
+        self.http = WeChatSession(limiter=self.rate_limiter)
+        # 接口重试策略与本次运行的重试预算
+        self.retry = RetryPolicy()
+        # 已上传图片缓存：内容哈希 -> 微信图片URL；演练时使用独立的缓存，避免混入模拟地址
+        media_dir = Path(dry_run_dir) if self.dry_run else Path('config')
+        self.image_cache = MediaCache(
+            media_dir / 'image_cache.json',
+            max_age_days=int(os.getenv('WECHAT_IMAGE_CACHE_DAYS', '180'))
+        )
+        # 缩略图素材登记：内容哈希 -> 永久素材media_id
+        self.thumb_registry = MediaCache(media_dir / 'thumb_media.json', max_age_days=3650)
+        self.thumb_validate_interval = float(os.getenv('WECHAT_THUMB_VALIDATE_DAYS', '7')) * 86400
+        # 按内容哈希加锁：并发处理的文章引用相同的图片或缩略图时只上传一次
+        self._image_locks = {}
+        self._thumb_locks = {}
+        self._media_locks_guard = threading.Lock()
+        # 图片上传前的缩放与压缩
+        self.image_prep = ImagePreprocessor(cache_root() / 'images')
+        # 复用的Markdown渲染器及渲染结果缓存
+        self.renderer = WeChatRenderer()
+        self.inliner = CSSInliner()
+        self.render_cache = RenderCache(cache_root() / 'render')
+        # 正文超出草稿接口长度限制时拆分为多篇
+        self.content_budget = ContentBudget()
+        # 各阶段耗时与上传量统计，运行结束时写入运行报告
+        self.metrics = Instrumentation()
         
         if not self.app_id or not self.app_secret:
             raise ValueError("未设置微信公众号配置")
@@ -24,518 +186,288 @@ class WeChatPublisher:
         """获取access_token"""
         if self.access_token and time.time() < self.access_token_expires:
             return self.access_token
+        
+        # 并发上传时只允许一个线程刷新token
+        with self._token_lock:
+            if self.access_token and time.time() < self.access_token_expires:
+                return self.access_token
+            
+            if not self.token_store:
+                return self._fetch_access_token()
             
-        url = f"https://api.weixin.qq.com/cgi-bin/token?grant_type=client_credential&appid={self.app_id}&secret={self.app_secret}"
-        response = requests.get(url)
-        result = response.json()
+            # 跨进程共享：持文件锁期间其他进程等待并复用刷新结果
+            with self.token_store.locked():
+                token, expires_at = self.token_store.load(self.app_id)
+                if token and time.time() < expires_at:
+                    print("🔑 复用缓存的access_token")
+                    self.access_token = token
+                    self.access_token_expires = expires_at
+                    return token
+                
+                token = self._fetch_access_token()
+                self.token_store.save(self.app_id, token, self.access_token_expires)
+                return token
+    
+    def _fetch_access_token(self):
+        """向微信服务器请求新的access_token"""
+        result = self._call_api(
+            'GET', 'token', expect='access_token', error_prefix='获取access_token失败',
+            query=f"grant_type=client_credential&appid={self.app_id}&secret={self.app_secret}",
+            use_token=False
+        )
+        return self.set_access_token(result)
+    
+    def set_access_token(self, result):
+        """保存接口返回的access_token，提前10分钟视为过期"""
+        self.access_token = result['access_token']
+        self.access_token_expires = time.time() + result['expires_in'] - 600
+        return self.access_token
+    
+    def invalidate_access_token(self, access_token):
+        """微信判定token失效时丢弃，下次调用会重新获取；共享的 token 文件需持文件锁修改"""
+        with self._token_lock:
+            if self.access_token == access_token:
+                self.access_token = None
+                self.access_token_expires = 0
+        if self.token_store:
+            self.token_store.invalidate(self.app_id, access_token)
+    
+    def _call_api(self, method, endpoint, expect, error_prefix, query='', json_body=None, files=None, use_token=True, binary_ok=False):
+        """调用微信接口，按errcode分类重试，成功时返回响应JSON
+        
+        binary_ok 为 True 时，非JSON响应（如素材文件内容）视为成功并返回空字典
+        """
+        data, headers = encode_request(json_body, files)
+        upload_bytes = len(data) if files else 0
+        
+        self.retry.record_call(endpoint)
+        attempt = 0
+        while True:
+            access_token = self.get_access_token() if use_token else None
+            url = api_url(self.api_base, endpoint, access_token, query)
+            if upload_bytes:
+                self.metrics.count('upload_bytes', upload_bytes)
+            sent_at = time.time()
+            
+            try:
+                if self.dry_run:
+                    result = self.dry_run.call(endpoint, access_token, query, json_body, files)
+                else:
+                    response = self.http.request(method, url, data=data, headers=headers, stream=binary_ok)
+                    if response.status_code >= 500:
+                        raise WeChatAPIError(f"{error_prefix}: HTTP {response.status_code}")
+                    content_type = response.headers.get('Content-Type', '')
+                    if binary_ok and not content_type.startswith(('application/json', 'text/')):
+                        response.close()
+                        return {}
+                    result = response.json()
+            except (requests.RequestException, ValueError, WeChatAPIError) as e:
+                error, kind = e, classify_transport_error(endpoint, request_sent(e))
+            else:
+                failure = check_result(result, expect, error_prefix)
+                if failure is None:
+                    return result
+                error, kind = failure
+            
+            if kind == UNCERTAIN:
+                created, kind = self._check_created(endpoint, json_body, sent_at)
+                if created is not None:
+                    return created
+            if kind == TOKEN_EXPIRED and access_token:
+                self.invalidate_access_token(access_token)
+            time.sleep(retry_delay(self.retry, endpoint, attempt, error, kind))
+            attempt += 1
+    
+    def _check_created(self, endpoint, json_body, sent_at):
+        """非幂等接口结果未知时避免重复执行，返回 (已创建的结果, 错误类别)
         
-        if 'access_token' in result:
-            self.access_token = result['access_token']
-            self.access_token_expires = time.time() + result['expires_in'] - 600
-            return self.access_token
-        else:
-            raise Exception(f"获取access_token失败: {result}")
+        草稿先在最近的草稿中查找，确认未创建才重试；发布无法确认，不再重试，避免再次群发
+        """
+        if not can_reconcile(endpoint):
+            return None, FATAL
+        try:
+            drafts = self._call_api('POST', 'draft/batchget', expect='item', error_prefix='查询草稿失败',
+                                    json_body=draft_lookup_body())
+        except Exception as e:
+            print(f"⚠️  无法确认草稿是否已创建，不再重试: {e}")
+            return None, FATAL
+        return match_created_draft(drafts, json_body['articles'], sent_at), RETRYABLE
     
     def upload_image(self, image_path):
-        """上传图片到微信服务器"""
-        access_token = self.get_access_token()
-        url = f"https://api.weixin.qq.com/cgi-bin/media/uploadimg?access_token={access_token}"
-        
-        with open(image_path, 'rb') as f:
-            files = {'media': (os.path.basename(image_path), f, 'image/jpeg')}
-            response = requests.post(url, files=files)
-            result = response.json()
+        """上传图片到微信服务器，内容未变化的图片直接复用已上传的URL"""
+        digest = file_digest(image_path)
+        with self._media_locks_guard:
+            lock = self._image_locks.setdefault(digest, threading.Lock())
+        
+        # 多篇文章并发引用同一张图片时，后到的线程等待并复用第一次上传的结果
+        with lock:
+            cached = self.image_cache.get(digest)
+            if cached and cached.get('size') == os.path.getsize(image_path):
+                return cached['url']
             
-        # 成功时没有errcode字段，失败时有errcode字段
-        if 'errcode' not in result and 'url' in result:
+            # 缩放压缩后以正确的MIME类型上传
+            prepared = self.image_prep.prepare(image_path)
+            files = {'media': (prepared.filename, prepared.source, prepared.mime)}
+            result = self._call_api('POST', 'media/uploadimg', expect='url', error_prefix='图片上传失败', files=files)
+            
+            self.image_cache.put(digest, url=result['url'], size=os.path.getsize(image_path))
             return result['url']
-        else:
-            raise Exception(f"图片上传失败: {result}")
     
     def upload_thumb_media(self, image_path):
         """上传缩略图素材"""
-        print(f"🔍 开始上传缩略图: {image_path}")
-        access_token = self.get_access_token()
-        url = f"https://api.weixin.qq.com/cgi-bin/material/add_material?access_token={access_token}&type=thumb"
-        print(f"🔍 上传URL: {url}")
+        # 缩略图素材仅支持64KB以内的JPG
+        prepared = self.image_prep.prepare(image_path, max_bytes=THUMB_MAX_BYTES, formats=('JPEG',), max_width=900)
+        files = {'media': (prepared.filename, prepared.source, prepared.mime)}
+        try:
+            result = self._call_api(
+                'POST', 'material/add_material', expect='media_id', error_prefix='缩略图上传失败',
+                query='type=thumb', files=files
+            )
+        except Exception as e:
+            print(f"❌ {e}")
+            raise
         
-        with open(image_path, 'rb') as f:
-            files = {'media': (os.path.basename(image_path), f, 'image/jpeg')}
-            print(f"🔍 文件信息: {os.path.basename(image_path)}, 大小: {os.path.getsize(image_path)} bytes")
-            response = requests.post(url, files=files)
-            result = response.json()
-            print(f"🔍 上传响应: {result}")
+        media_id = result['media_id']
+        print(f"✅ 缩略图上传成功，media_id: {media_id}")
+        return media_id
+    
+    def get_thumb_media_id(self, image_path):
+        """获取缩略图media_id：相同内容的缩略图只上传一次，之后复用登记的素材"""
+        digest = file_digest(image_path)
+        with self._media_locks_guard:
+            lock = self._thumb_locks.setdefault(digest, threading.Lock())
+        
+        # 同一张缩略图（如默认缩略图）被多篇文章并发使用时只上传一次
+        with lock:
+            entry = self.thumb_registry.get(digest)
+            if entry and self._thumb_still_valid(digest, entry):
+                self.metrics.count('thumb_reused')
+                print(f"♻️  复用已上传的缩略图: {entry['media_id']}")
+                return entry['media_id']
             
-        # 成功时没有errcode字段，失败时有errcode字段
-        if 'errcode' not in result and 'media_id' in result:
-            media_id = result['media_id']
-            print(f"✅ 缩略图上传成功，media_id: {media_id}")
+            media_id = self.upload_thumb_media(image_path)
+            self.thumb_registry.put(digest, media_id=media_id, validated_at=time.time())
             return media_id
-        else:
-            print(f"❌ 缩略图上传失败: {result}")
-            raise Exception(f"缩略图上传失败: {result}")
+    
+    def registered_thumb(self, image_path):
+        """登记中的缩略图 media_id，不校验、不计入复用统计；未登记或已失效时返回 None"""
+        entry = self.thumb_registry.peek(file_digest(image_path))
+        return entry['media_id'] if entry else None
+    
+    def _thumb_still_valid(self, digest, entry):
+        """惰性校验：超过校验间隔的素材通过 material/get_material 确认仍然存在"""
+        if not self.thumb_needs_check(entry):
+            return True
+        try:
+            self.get_material(entry['media_id'])
+        except WeChatAPIError as e:
+            return self.thumb_checked(digest, e)
+        return self.thumb_checked(digest)
+    
+    def thumb_needs_check(self, entry):
+        return time.time() - entry.get('validated_at', 0) >= self.thumb_validate_interval
+    
+    def thumb_checked(self, digest, error=None):
+        """记录素材校验结果，返回素材是否仍然可用"""
+        if error is not None:
+            print(f"⚠️  缩略图素材已失效，将重新上传: {error}")
+            self.thumb_registry.invalidate(digest)
+            return False
+        self.thumb_registry.update(digest, validated_at=time.time())
+        return True
+    
+    def invalidate_thumb(self, media_id):
+        """草稿接口报告素材无效时移除对应登记"""
+        for digest, entry in list(self.thumb_registry.entries.items()):
+            if entry.get('media_id') == media_id:
+                self.thumb_registry.invalidate(digest)
+    
+    def upload_images(self, image_paths):
+        """并发上传多张图片，返回 {路径: 微信URL或异常}"""
+        results = {}
+        if not image_paths:
+            return results
+        
+        workers = min(self.upload_workers, len(image_paths))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.upload_image, path): path for path in image_paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    results[path] = future.result()
+                except Exception as e:
+                    results[path] = e
+        return results
     
     def process_markdown_content(self, markdown_content, article_dir):
         """处理Markdown内容，上传图片并转换HTML"""
+        with self.metrics.span('render'):
+            rendered = self.render_markdown(markdown_content)
+        with self.metrics.span('images'):
+            return self.resolve_images(rendered['html'], rendered['images'], article_dir)
+    
+    def render_markdown(self, markdown_content):
+        """将Markdown渲染为带样式的HTML，图片以占位符表示
         
-        def replace_images(match):
-            img_alt = match.group(1)
-            img_path = match.group(2)
+        返回 {'html': ..., 'images': [[alt, path], ...]}，结果按内容和渲染配置缓存
+        """
+        cache_key = RenderCache.make_key(
+            markdown_content, MARKDOWN_EXTENSIONS, MARKDOWN_EXTENSION_CONFIGS, RENDERER_VERSION, self.inliner.version
+        )
+        cached = self.render_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        rendered = self.renderer.render(markdown_content)
+        rendered['html'] = minify_html(self.add_wechat_styles(rendered['html']))
+        self.render_cache.put(cache_key, rendered)
+        return rendered
+    
+    def resolve_images(self, html, images, article_dir):
+        """上传本地图片并把占位符替换为最终地址"""
+        # 第一阶段：收集所有本地图片引用并并发上传
+        uploaded = self.upload_images(self.local_images(images, article_dir))
+        # 第二阶段：一次性替换图片地址
+        return self.replace_images(html, images, article_dir, uploaded)
+    
+    @staticmethod
+    def local_images(images, article_dir):
+        """渲染结果引用的本地图片文件（去重，保持顺序）"""
+        local_images = []
+        for _, img_path in images:
+            if not img_path.startswith(('http://', 'https://')):
+                full_path = str(Path(article_dir) / img_path)
+                if full_path not in local_images and Path(full_path).exists():
+                    local_images.append(full_path)
+        return local_images
+    
+    def replace_images(self, html, images, article_dir, uploaded):
+        """把图片占位符替换为上传结果 {路径: 微信URL或异常}，远程图片保持原地址"""
+        def replace_placeholder(match):
+            img_alt, img_path = images[int(match.group(1))]
             
             # 处理相对路径
             if not img_path.startswith(('http://', 'https://')):
-                full_path = Path(article_dir) / img_path
-                if full_path.exists():
-                    try:
-                        wx_url = self.upload_image(str(full_path))
-                        return f'<div class="img-container"><img src="{wx_url}" alt="{img_alt}"><div class="img-caption">{img_alt}</div></div>'
-                    except Exception as e:
-                        print(f"⚠️  图片上传失败 {img_path}: {e}")
-                        return f'<p>[图片上传失败: {img_alt}]</p>'
+                result = uploaded.get(str(Path(article_dir) / img_path))
+                if isinstance(result, Exception):
+                    print(f"⚠️  图片上传失败 {img_path}: {result}")
+                    return self.inliner.inline(f'<p>[图片上传失败: {img_alt}]</p>')
+                if result:
+                    img_path = result
             
-            return f'<div class="img-container"><img src="{img_path}" alt="{img_alt}"><div class="img-caption">{img_alt}</div></div>'
-        
-        # 预处理：添加特殊标记
-        # 将 **文本** 转换为带高亮的strong标签
-        markdown_content = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', markdown_content)
-        
-        # 将重要提示转换为特殊样式
-        markdown_content = re.sub(r'(?:^|\n)> (.*?)(?=\n|$)', r'\n<blockquote>\1</blockquote>\n', markdown_content, flags=re.MULTILINE)
-        
-        # 替换图片
-        markdown_content = re.sub(r'!\[(.*?)\]\((.*?)\)', replace_images, markdown_content)
-        
-        # 添加章节分隔符
-        markdown_content = re.sub(r'\n---\n', '<div class="section-divider"><span>◆ ◆ ◆</span></div>', markdown_content)
-        
-        # 转换为HTML
-        html = markdown.markdown(
-            markdown_content,
-            extensions=['codehilite', 'tables', 'toc', 'fenced_code'],
-            extension_configs={
-                'codehilite': {
-                    'css_class': 'highlight',
-                    'use_pygments': True
-                }
-            }
-        )
-        
-        # 后处理：优化HTML结构
-        # 包装内容
-        html = f'<div class="content">{html}</div>'
+            # 只替换地址，保留渲染时内联的样式
+            return match.group(0).replace(
+                f'src="{IMAGE_PLACEHOLDER}{match.group(1)}"', f'src="{html_escape(img_path, quote=True)}"', 1
+            )
         
-        # 为表格添加容器
-        html = re.sub(r'<table>', '<div class="table-container"><table>', html)
-        html = re.sub(r'</table>', '</table></div>', html)
-        
-        return self.add_wechat_styles(html)
+        return IMAGE_PLACEHOLDER_PATTERN.sub(replace_placeholder, html)
     
     def add_wechat_styles(self, html):
-        """添加微信公众号样式 - 现代化设计版本"""
-        styles = """<style>
-/* 基础样式 */
-body {
-    font-family: -apple-system, "PingFang SC", "Hiragino Sans GB", "Microsoft YaHei", "Segoe UI", Roboto, Arial, sans-serif;
-    font-size: 17px;
-    line-height: 1.75;
-    color: #2c3e50;
-    margin: 0;
-    padding: 24px;
-    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-    background-attachment: fixed;
-}
-
-.content {
-    max-width: 100%;
-    margin: 0 auto;
-    background: #ffffff;
-    border-radius: 16px;
-    padding: 32px;
-    box-shadow: 0 20px 40px rgba(0, 0, 0, 0.1);
-    position: relative;
-}
-
-.content::before {
-    content: "";
-    position: absolute;
-    top: 0;
-    left: 0;
-    right: 0;
-    height: 4px;
-    background: linear-gradient(90deg, #667eea, #764ba2, #f093fb, #f5576c);
-    border-radius: 16px 16px 0 0;
-}
-
-/* 标题样式 */
-h1 {
-    font-size: 2.2em;
-    font-weight: 800;
-    color: #2c3e50;
-    text-align: center;
-    margin: 2em 0 1.5em;
-    padding: 20px 0;
-    position: relative;
-    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-    -webkit-background-clip: text;
-    -webkit-text-fill-color: transparent;
-    background-clip: text;
-}
-
-h1::after {
-    content: "";
-    position: absolute;
-    bottom: -10px;
-    left: 50%;
-    width: 60px;
-    height: 4px;
-    background: linear-gradient(90deg, #667eea, #764ba2);
-    border-radius: 2px;
-    transform: translateX(-50%);
-}
-
-h2 {
-    font-size: 1.6em;
-    font-weight: 700;
-    color: #34495e;
-    margin: 2.5em 0 1.2em;
-    padding: 16px 24px;
-    background: linear-gradient(135deg, #f8fafc 0%, #e2e8f0 100%);
-    border-left: 5px solid #667eea;
-    border-radius: 0 12px 12px 0;
-    position: relative;
-    box-shadow: 0 4px 12px rgba(102, 126, 234, 0.1);
-}
-
-h2::before {
-    content: "✦";
-    color: #667eea;
-    font-size: 1.2em;
-    margin-right: 8px;
-}
-
-h3 {
-    font-size: 1.3em;
-    font-weight: 600;
-    color: #e74c3c;
-    margin: 2em 0 1em;
-    padding: 8px 16px;
-    border-left: 3px solid #e74c3c;
-    background: linear-gradient(90deg, #fef5f5 0%, transparent 100%);
-    border-radius: 0 8px 8px 0;
-}
-
-/* 段落和文本样式 */
-p {
-    margin: 1.5em 0;
-    text-align: justify;
-    line-height: 1.8;
-    font-size: 17px;
-    color: #34495e;
-    text-indent: 0;
-}
-
-strong {
-    color: #2c3e50;
-    font-weight: 700;
-    background: linear-gradient(120deg, #84fab0 0%, #8fd3f4 100%);
-    padding: 3px 8px;
-    border-radius: 6px;
-    box-shadow: 0 2px 4px rgba(132, 250, 176, 0.3);
-}
-
-em {
-    color: #e74c3c;
-    font-style: normal;
-    font-weight: 600;
-    background: linear-gradient(120deg, #ffeaa7 0%, #fab1a0 100%);
-    padding: 2px 6px;
-    border-radius: 4px;
-}
-
-/* 代码样式 */
-code {
-    background: #f8fafc;
-    padding: 4px 8px;
-    border-radius: 6px;
-    color: #e91e63;
-    font-size: 0.9em;
-    border: 1px solid #e2e8f0;
-    font-family: "Fira Code", "JetBrains Mono", Consolas, monospace;
-}
-
-pre {
-    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-    padding: 24px;
-    border-radius: 12px;
-    overflow-x: auto;
-    margin: 2em 0;
-    position: relative;
-    color: #ffffff;
-    font-family: "Fira Code", "JetBrains Mono", Consolas, monospace;
-    box-shadow: 0 8px 32px rgba(102, 126, 234, 0.3);
-}
-
-pre::before {
-    content: "{ code }";
-    position: absolute;
-    top: 12px;
-    right: 16px;
-    color: rgba(255, 255, 255, 0.7);
-    font-size: 12px;
-    font-weight: 500;
-}
-
-pre code {
-    background: transparent;
-    border: none;
-    color: inherit;
-    padding: 0;
-}
-
-/* 引用样式 */
-blockquote {
-    border-left: 5px solid #667eea;
-    margin: 2em 0;
-    padding: 20px 24px;
-    background: linear-gradient(135deg, #f8fafc 0%, #e2e8f0 100%);
-    border-radius: 0 12px 12px 0;
-    position: relative;
-    box-shadow: 0 4px 20px rgba(102, 126, 234, 0.1);
-}
-
-blockquote::before {
-    content: "💫";
-    position: absolute;
-    top: 16px;
-    left: -16px;
-    background: #ffffff;
-    padding: 8px;
-    border-radius: 50%;
-    font-size: 16px;
-    box-shadow: 0 4px 12px rgba(0, 0, 0, 0.1);
-}
-
-/* 列表样式 */
-ul, ol {
-    margin: 1.5em 0;
-    padding-left: 0;
-    list-style: none;
-}
-
-ul li {
-    position: relative;
-    margin: 1em 0;
-    padding-left: 2em;
-    line-height: 1.7;
-}
-
-ul li::before {
-    content: "▸";
-    color: #667eea;
-    font-weight: bold;
-    font-size: 1.2em;
-    position: absolute;
-    left: 0;
-    top: 0;
-}
-
-ol {
-    counter-reset: item;
-}
-
-ol li {
-    position: relative;
-    margin: 1em 0;
-    padding-left: 2.5em;
-    line-height: 1.7;
-    counter-increment: item;
-}
-
-ol li::before {
-    content: counter(item);
-    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-    color: #ffffff;
-    border-radius: 50%;
-    width: 24px;
-    height: 24px;
-    display: inline-flex;
-    align-items: center;
-    justify-content: center;
-    position: absolute;
-    left: 0;
-    top: 0;
-    font-size: 13px;
-    font-weight: 700;
-    box-shadow: 0 4px 12px rgba(102, 126, 234, 0.3);
-}
-
-/* 图片样式 */
-img {
-    max-width: 100%;
-    height: auto;
-    border-radius: 16px;
-    margin: 2em auto;
-    display: block;
-    box-shadow: 0 12px 40px rgba(0, 0, 0, 0.15);
-    transition: transform 0.3s ease, box-shadow 0.3s ease;
-}
-
-.img-container {
-    text-align: center;
-    margin: 2.5em 0;
-    padding: 16px;
-    background: linear-gradient(135deg, #f8fafc 0%, #e2e8f0 100%);
-    border-radius: 20px;
-    box-shadow: 0 4px 20px rgba(0, 0, 0, 0.08);
-}
-
-.img-caption {
-    text-align: center;
-    color: #64748b;
-    font-size: 15px;
-    margin-top: 12px;
-    font-style: italic;
-    padding: 8px 16px;
-    background: rgba(255, 255, 255, 0.8);
-    border-radius: 8px;
-    display: inline-block;
-}
-
-/* 表格样式 */
-.table-container {
-    overflow-x: auto;
-    margin: 2em 0;
-    border-radius: 12px;
-    box-shadow: 0 8px 32px rgba(0, 0, 0, 0.1);
-    background: #ffffff;
-}
-
-table {
-    border-collapse: collapse;
-    width: 100%;
-    margin: 0;
-    font-size: 0.95em;
-    background: #ffffff;
-}
-
-th, td {
-    border: 1px solid #e2e8f0;
-    padding: 16px 20px;
-    text-align: left;
-}
-
-th {
-    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-    color: #ffffff;
-    font-weight: 700;
-    border-bottom: 2px solid #5a67d8;
-    text-transform: uppercase;
-    letter-spacing: 0.5px;
-    font-size: 0.9em;
-}
-
-tr:nth-child(even) {
-    background: #f8fafc;
-}
-
-tr:hover {
-    background: linear-gradient(135deg, #f8fafc 0%, #e2e8f0 100%);
-}
-
-/* 链接样式 */
-a {
-    color: #667eea;
-    text-decoration: none;
-    border-bottom: 2px solid transparent;
-    transition: all 0.3s ease;
-    font-weight: 500;
-}
-
-a:hover {
-    border-bottom-color: #667eea;
-    transform: translateY(-1px);
-}
-
-/* 分隔线样式 */
-hr {
-    border: none;
-    height: 2px;
-    background: linear-gradient(90deg, transparent, #667eea, transparent);
-    margin: 3em 0;
-    border-radius: 1px;
-}
-
-/* 高亮样式 */
-.highlight {
-    background: linear-gradient(120deg, #fff9c4 0%, #fff59d 100%);
-    padding: 3px 8px;
-    border-radius: 6px;
-    color: #7c3aed;
-    font-weight: 600;
-    box-shadow: 0 2px 8px rgba(255, 245, 157, 0.4);
-}
-
-/* 章节分隔符 */
-.section-divider {
-    text-align: center;
-    margin: 3em 0;
-    position: relative;
-}
-
-.section-divider::before {
-    content: "";
-    position: absolute;
-    top: 50%;
-    left: 0;
-    right: 0;
-    height: 2px;
-    background: linear-gradient(90deg, transparent, #667eea, transparent);
-}
-
-.section-divider span {
-    background: #ffffff;
-    padding: 0 24px;
-    color: #667eea;
-    font-size: 16px;
-    font-weight: 600;
-    position: relative;
-    z-index: 1;
-}
-
-/* 响应式设计 */
-@media (max-width: 768px) {
-    body { padding: 16px; }
-    .content { padding: 24px 20px; }
-    h1 { font-size: 1.8em; }
-    h2 { font-size: 1.4em; padding: 12px 16px; }
-    h3 { font-size: 1.2em; }
-    p { font-size: 16px; }
-}
-</style>"""
-        
-        return styles + html
+        """添加微信公众号样式：内联到元素上，微信会过滤 <style> 块"""
+        return self.inliner.inline(html)
     
-    def create_draft(self, title, content, author, digest, thumb_media_id, source_url):
-        """创建草稿"""
-        print(f"🔍 创建草稿 - 标题: {title}")
-        print(f"🔍 传入的thumb_media_id: '{thumb_media_id}', 类型: {type(thumb_media_id)}, 长度: {len(thumb_media_id) if thumb_media_id else 0}")
-        
-        # 调试各字段长度
-        print(f"🔍 各字段长度检查:")
-        print(f"   - title长度: {len(title)} 字符")
-        print(f"   - author长度: {len(author)} 字符")  
-        print(f"   - digest长度: {len(digest)} 字符")
-        print(f"   - content长度: {len(content)} 字符")
-        print(f"   - source_url长度: {len(source_url)} 字符")
-        
-        # 检查content长度是否超过微信API限制
-        if len(content) > 20000:
-            print(f"⚠️  content内容过长({len(content)}字符)，将被截断至20000字符")
-            content = content[:20000]
-        
-        access_token = self.get_access_token()
-        url = f"https://api.weixin.qq.com/cgi-bin/draft/add?access_token={access_token}"
-        
+    def build_draft_article(self, title, content, author, digest, thumb_media_id, source_url):
+        """草稿中单篇文章的数据"""
         article_data = {
             "title": title,
             "author": author,
@@ -550,60 +482,112 @@ hr {
         if not thumb_media_id or not thumb_media_id.strip():
             raise Exception("缩略图 media_id 不能为空，这是微信草稿API的必填字段")
         
-        print(f"✅ 添加缩略图到草稿: {thumb_media_id}")
         article_data["thumb_media_id"] = thumb_media_id
+        return article_data
+    
+    def create_draft(self, title, content, author, digest, thumb_media_id, source_url):
+        """创建草稿"""
+        return self.create_multi_draft([
+            self.build_draft_article(title, content, author, digest, thumb_media_id, source_url)
+        ])
+    
+    def create_multi_draft(self, articles):
+        """创建草稿，一个草稿最多包含8篇文章"""
+        data = {"articles": articles}
         
-        data = {"articles": [article_data]}
-        print(f"🔍 发送到微信API的数据: {json.dumps(data, indent=2, ensure_ascii=False)}")
-        
-        # 明确设置编码以避免中文乱码
-        headers = {
-            'Content-Type': 'application/json; charset=utf-8'
-        }
-        json_data = json.dumps(data, ensure_ascii=False).encode('utf-8')
-        response = requests.post(url, data=json_data, headers=headers)
-        result = response.json()
-        print(f"🔍 微信API响应: {result}")
+        try:
+            result = self._call_api('POST', 'draft/add', expect='media_id', error_prefix='创建草稿失败', json_body=data)
+        except Exception as e:
+            print(f"❌ {e}")
+            raise
         
-        # 成功时没有errcode字段，失败时有errcode字段
-        if 'errcode' not in result and 'media_id' in result:
-            print(f"✅ 草稿创建成功，media_id: {result['media_id']}")
-            return result['media_id']
-        else:
-            print(f"❌ 草稿创建失败: {result}")
-            raise Exception(f"创建草稿失败: {result}")
+        print(f"✅ 草稿创建成功，media_id: {result['media_id']}")
+        return result['media_id']
     
     def publish_draft(self, media_id):
         """发布草稿"""
-        access_token = self.get_access_token()
-        url = f"https://api.weixin.qq.com/cgi-bin/freepublish/submit?access_token={access_token}"
-        
         data = {"media_id": media_id}
-        headers = {
-            'Content-Type': 'application/json; charset=utf-8'
-        }
-        json_data = json.dumps(data, ensure_ascii=False).encode('utf-8')
-        response = requests.post(url, data=json_data, headers=headers)
-        result = response.json()
+        result = self._call_api('POST', 'freepublish/submit', expect='publish_id', error_prefix='发布失败', json_body=data)
+        return result.get('publish_id')
+    
+    def get_publish_status(self, publish_id):
+        """查询发布任务状态"""
+        data = {"publish_id": publish_id}
+        return self._call_api('POST', 'freepublish/get', expect='publish_status', error_prefix='查询发布状态失败', json_body=data)
+    
+    def get_material(self, media_id):
+        """获取永久素材，用于确认素材仍然存在"""
+        data = {"media_id": media_id}
+        return self._call_api('POST', 'material/get_material', expect=None, error_prefix='获取素材失败', json_body=data, binary_ok=True)
+    
+    def find_thumb(self, article_dir):
+        """查找并上传文章的缩略图，返回 (thumb_media_id, 缩略图文件)；没有可用的缩略图时使用默认缩略图"""
+        for thumb_path in self.thumb_candidates(article_dir):
+            try:
+                thumb_media_id = self.get_thumb_media_id(thumb_path)
+            except Exception as e:
+                self.thumb_failed(thumb_path, e)
+            else:
+                return self.thumb_ready(thumb_path, thumb_media_id)
+    
+    @staticmethod
+    def thumb_candidates(article_dir):
+        """按顺序产出候选缩略图：文章目录中的缩略图，最后是默认缩略图"""
+        for thumb_name in THUMB_NAMES:
+            thumb_path = article_dir / thumb_name
+            if thumb_path.exists():
+                yield str(thumb_path)
         
-        # 成功时没有errcode字段，失败时有errcode字段
-        if 'errcode' not in result and 'publish_id' in result:
-            return result.get('publish_id')
+        print("⚠️  未找到缩略图或上传失败，尝试使用默认缩略图")
+        if not DEFAULT_THUMB_PATH.exists():
+            raise Exception(f"默认缩略图文件不存在: {DEFAULT_THUMB_PATH}")
+        yield str(DEFAULT_THUMB_PATH)
+    
+    @staticmethod
+    def thumb_failed(thumb_path, error):
+        """候选缩略图上传失败时换下一个；默认缩略图也失败时无法创建草稿"""
+        if thumb_path != str(DEFAULT_THUMB_PATH):
+            print(f"⚠️  缩略图上传失败 {Path(thumb_path).name}: {error}")
+            return
+        print(f"❌ 默认缩略图上传失败: {error}")
+        raise Exception(f"无法获取有效的缩略图 media_id，草稿创建需要缩略图: {error}")
+    
+    @staticmethod
+    def thumb_ready(thumb_path, thumb_media_id):
+        if thumb_path == str(DEFAULT_THUMB_PATH):
+            print(f"✅ 默认缩略图就绪，media_id: {thumb_media_id}")
         else:
-            raise Exception(f"发布失败: {result}")
+            print(f"✅ 缩略图就绪: {Path(thumb_path).name}, media_id: {thumb_media_id}")
+        return thumb_media_id, thumb_path
     
-    def publish_article(self, article_info):
-        """发布单篇文章"""
+    def prepare_article(self, article_info):
+        """渲染文章、上传图片和缩略图，生成草稿数据
+        
+        返回 [{'article': 草稿中的文章数据, 'thumb_source': 缩略图文件}, ...]，正文超长时拆分为多篇
+        """
+        with self.metrics.article(article_info['file_path']):
+            return self._prepare_article(article_info)
+    
+    def _prepare_article(self, article_info):
         file_path = Path(article_info['file_path'])
         article_dir = file_path.parent
         
         # 读取文章内容
-        with open(file_path, 'r', encoding='utf-8') as f:
-            markdown_content = f.read()
+        with self.metrics.span('read'):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                markdown_content = f.read()
         
         # 处理内容
         html_content = self.process_markdown_content(markdown_content, article_dir)
         
+        # 查找缩略图
+        with self.metrics.span('thumb'):
+            thumb_media_id, thumb_source = self.find_thumb(article_dir)
+        
+        return self.build_parts(article_info, markdown_content, html_content, thumb_media_id, thumb_source)
+    
+    def build_parts(self, article_info, markdown_content, html_content, thumb_media_id, thumb_source):
+        """生成摘要并按长度限制拆分正文，返回各篇的草稿数据"""
         # 生成摘要 - 微信公众号digest字段严格限制
         content_text = re.sub(r'[#*`\[\]()-]', '', markdown_content)
         content_text = re.sub(r'\n+', ' ', content_text)  # 将换行替换为空格
@@ -615,128 +599,300 @@ hr {
         else:
             digest = content_text
         
-        # 查找缩略图
-        thumb_media_id = ""
-        print(f"🔍 开始查找缩略图，目录: {article_dir}")
-        
-        for thumb_name in ['thumb.jpg', 'thumb.jpeg', 'thumb.png', 'cover.jpg', 'cover.png']:
-            thumb_path = article_dir / thumb_name
-            print(f"🔍 检查缩略图文件: {thumb_path}")
-            if thumb_path.exists():
-                print(f"📁 找到缩略图文件: {thumb_name}")
-                try:
-                    thumb_media_id = self.upload_thumb_media(str(thumb_path))
-                    print(f"✅ 缩略图上传成功: {thumb_name}, media_id: {thumb_media_id}")
-                    break
-                except Exception as e:
-                    print(f"⚠️  缩略图上传失败 {thumb_name}: {e}")
-                    thumb_media_id = ""  # 确保失败时重置为空字符串
-                    continue
-        
-        print(f"🔍 最终缩略图状态 - thumb_media_id: '{thumb_media_id}', 类型: {type(thumb_media_id)}, 布尔值: {bool(thumb_media_id)}")
-        
-        if not thumb_media_id:
-            print("⚠️  未找到缩略图或上传失败，尝试使用默认缩略图")
-            default_thumb_path = Path(__file__).parent.parent / 'config' / 'default_thumb.jpg'
-            if default_thumb_path.exists():
-                try:
-                    thumb_media_id = self.upload_thumb_media(str(default_thumb_path))
-                    print(f"✅ 默认缩略图上传成功，media_id: {thumb_media_id}")
-                except Exception as e:
-                    print(f"❌ 默认缩略图上传失败: {e}")
-                    raise Exception(f"无法获取有效的缩略图 media_id，草稿创建需要缩略图: {e}")
-            else:
-                raise Exception(f"默认缩略图文件不存在: {default_thumb_path}")
-        
-        # 创建草稿
-        media_id = self.create_draft(
-            title=article_info['title'],
-            content=html_content,
-            author=self.author,
-            digest=digest,
-            thumb_media_id=thumb_media_id,
-            source_url=self.source_url
-        )
+        # 正文超出长度限制时拆分为多篇
+        contents = self.content_budget.fit(html_content)
+        if len(contents) > 1:
+            print(f"✂️  正文超出长度限制，拆分为 {len(contents)} 篇发布")
+        
+        parts = []
+        for index, content in enumerate(contents, 1):
+            title = article_info['title']
+            if len(contents) > 1:
+                title = f"{title}（{index}/{len(contents)}）"
+            article = self.build_draft_article(title, content, self.author, digest, thumb_media_id, self.source_url)
+            parts.append({'article': article, 'thumb_source': thumb_source})
+        return parts
+    
+    def add_draft(self, parts):
+        """为若干篇文章创建一个草稿，返回 media_id"""
+        thumbs = [self.draft_thumb(part['thumb_source']) for part in parts]
+        try:
+            return self.create_multi_draft(self.draft_articles(parts, thumbs))
+        except WeChatAPIError as e:
+            if not self.drop_stale_thumbs(parts, e):
+                raise
+            thumbs = [self.draft_thumb(part['thumb_source']) for part in parts]
+            return self.create_multi_draft(self.draft_articles(parts, thumbs))
+    
+    def draft_thumb(self, thumb_source):
+        """草稿使用的缩略图：取登记中的最新素材，已失效时重新上传
         
-        # 尝试发布草稿（可能因权限限制失败）
+        find_thumb 已校验并计入复用统计，这里不再重复；同一篇文章的前一个分篇可能已经重新上传过
+        """
+        return self.registered_thumb(thumb_source) or self.get_thumb_media_id(thumb_source)
+    
+    @staticmethod
+    def draft_articles(parts, thumbs):
+        """填入各分篇的缩略图，返回草稿接口的文章列表"""
+        for part, thumb_media_id in zip(parts, thumbs):
+            part['article']['thumb_media_id'] = thumb_media_id
+        return [part['article'] for part in parts]
+    
+    def drop_stale_thumbs(self, parts, error):
+        """登记的缩略图素材已被删除（40007）时移除登记，返回是否应重新上传后再试一次"""
+        if error.errcode != 40007:
+            return False
+        for thumb_media_id in {part['article']['thumb_media_id'] for part in parts}:
+            self.invalidate_thumb(thumb_media_id)
+        return True
+    
+    def publish_drafts(self, media_ids):
+        """按顺序发布草稿，返回 (publish_id 列表, 状态)；发布失败时草稿保留，需手动发布"""
+        publish_ids = [None] * len(media_ids)
         try:
-            publish_id = self.publish_draft(media_id)
-            print(f"✅ 草稿发布成功！publish_id: {publish_id}")
-            return {
-                'media_id': media_id,
-                'publish_id': publish_id,
-                'published_time': datetime.now().isoformat()
-            }
+            for index, media_id in enumerate(media_ids):
+                publish_ids[index] = self.publish_draft(media_id)
+                self.draft_published(publish_ids[index])
         except Exception as e:
-            print(f"⚠️  自动发布失败: {e}")
-            print(f"✅ 草稿已创建成功 (media_id: {media_id})，请手动在微信公众平台后台发布")
-            return {
-                'media_id': media_id,
-                'publish_id': None,
-                'published_time': datetime.now().isoformat(),
-                'status': 'draft_created_manual_publish_required'
-            }
-
-def main():
-    """主函数"""
+            return publish_ids, self.publish_failed(media_ids, e)
+        return publish_ids, None
+    
+    @staticmethod
+    def draft_published(publish_id):
+        print(f"✅ 草稿发布成功！publish_id: {publish_id}")
+    
+    @staticmethod
+    def publish_failed(media_ids, error):
+        """自动发布失败（如没有发布权限）：草稿保留，返回发布结果的状态"""
+        print(f"⚠️  自动发布失败: {error}")
+        print(f"✅ 草稿已创建成功 (media_id: {', '.join(media_ids)})，请手动在微信公众平台后台发布")
+        return MANUAL_PUBLISH_REQUIRED
+    
+    @staticmethod
+    def publish_result(parts, status=None):
+        """汇总一篇文章各分篇的草稿与发布ID"""
+        result = {
+            'media_id': parts[0]['media_id'],
+            'publish_id': parts[0]['publish_id'],
+            'published_time': datetime.now().isoformat()
+        }
+        if 'article_idx' in parts[0]:
+            result['article_idx'] = parts[0]['article_idx']
+        if status:
+            result['status'] = status
+        if len(parts) > 1:
+            result['parts'] = parts
+        return result
+    
+    def publish_article(self, article_info):
+        """发布单篇文章"""
+        with self.metrics.article(article_info['file_path']):
+            parts = self.prepare_article(article_info)
+            with self.metrics.span('draft'):
+                media_ids = [self.add_draft([part]) for part in parts]
+            
+            # 尝试发布草稿（可能因权限限制失败）
+            with self.metrics.span('publish'):
+                publish_ids, status = self.publish_drafts(media_ids)
+        return self.publish_result([
+            {'media_id': media_id, 'publish_id': publish_id}
+            for media_id, publish_id in zip(media_ids, publish_ids)
+        ], status)
+    
+    def publish_concurrently(self, articles):
+        """逐篇发布，多篇文章并发处理；按完成顺序产出 (文章, 发布结果或异常)"""
+        workers = min(self.publish_workers, len(articles))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            for article in articles:
+                print(f"\n📝 正在发布: {article['title']}")
+                futures[executor.submit(self.publish_article, article)] = article
+            
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+                yield futures[future], result
+    
+    def publish_batches(self, articles):
+        """批量模式：多篇文章合并为一个草稿，每个草稿只调用一次发布接口
+        
+        文章并发渲染和上传素材，草稿按配置的顺序依次创建；产出 (文章, 发布结果或异常)
+        """
+        articles = sort_articles(articles, self.batch_order)
+        workers = min(self.publish_workers, len(articles))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            for article in articles:
+                print(f"\n📝 正在准备: {article['title']}")
+                futures.append(executor.submit(self.prepare_article, article))
+        
+        prepared = []
+        for future in futures:
+            try:
+                prepared.append(future.result())
+            except Exception as e:
+                prepared.append(e)
+        
+        batches = DraftBatches(articles, prepared, self.batch_size)
+        yield from batches.failures
+        for group, parts, keys in batches.groups():
+            try:
+                with self.metrics.span('draft', keys):
+                    media_id = self.add_draft(parts)
+            except Exception as e:
+                yield from batches.fail(group, e)
+                continue
+            
+            with self.metrics.span('publish', keys):
+                publish_ids, status = self.publish_drafts([media_id])
+            yield from batches.done(group, media_id, publish_ids[0], status)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='发布文章到微信公众号')
+    parser.add_argument(
+        '--dry-run', nargs='?', const='dry_run', metavar='DIR',
+        help='离线演练：完整渲染并把接口请求写入目录（默认 dry_run/），不访问微信服务器，不修改发布记录'
+    )
+    return parser.parse_args(argv)
+
+def load_articles():
+    """读取待发布文章列表，没有时返回空列表"""
     # 检查是否有待发布文章
     to_publish_file = Path('to_publish.json')
     if not to_publish_file.exists():
         print("没有找到待发布文章列表")
-        return
+        return []
     
     with open(to_publish_file, 'r', encoding='utf-8') as f:
         articles = json.load(f)
     
     if not articles:
         print("没有需要发布的文章")
+    return articles
+
+def open_state(publisher, dry_run):
+    """打开发布记录并启动发布状态跟踪，返回 (store, tracker)"""
+    # 加载已发布记录；演练时使用内存数据库，不影响真实的发布记录
+    store = PublishStateStore(db_path=':memory:') if dry_run else PublishStateStore()
+    
+    # 后台轮询发布任务状态，上次运行未得到结果的任务继续跟踪
+    tracker = PublishStatusTracker(publisher.get_publish_status, store)
+    for path, record in store.all().items():
+        if record.get('publish_status') == PUBLISHING:
+            tracker.track_record(path, record)
+    return store, tracker
+
+def record_outcome(publisher, store, tracker, article, result):
+    """汇总一篇文章的发布结果，成功时返回 True"""
+    if isinstance(result, Exception):
+        print(f"❌ 发布失败: {article['title']}: {result}")
+        publisher.metrics.set_result(article['file_path'], title=article['title'], status='failed', error=str(result))
+        return False
+    
+    # 更新发布记录：每篇文章单独提交，中途失败也不会丢失已发布的结果
+    file_key = str(Path(article['file_path']).relative_to('articles'))
+    record = {
+        'title': article['title'],
+        'content_hash': article['content_hash'],
+        'published_time': result['published_time'],
+        'media_id': result['media_id'],
+        'publish_id': result['publish_id']
+    }
+    # 多图文草稿中的位置；拆分发布的文章记录每一篇的草稿和发布ID
+    for key in ('article_idx', 'parts'):
+        if key in result:
+            record[key] = result[key]
+    store.put(file_key, record)
+    tracker.track_record(file_key, record)
+    
+    print(f"✅ 发布成功！{article['title']} publish_id: {result['publish_id']}")
+    publisher.metrics.set_result(article['file_path'], title=article['title'], status='success')
+    return True
+
+def finish_run(publisher, store, tracker, dry_run, success_count, total, http_stats=None):
+    """推进发布进度、等待发布任务结果、保存记录并输出统计和运行报告
+    
+    http_stats 为空时使用发布器 HTTP 会话的统计
+    """
+    # 全部发布成功才推进发布进度，失败的文章下次仍在比较范围内
+    if success_count == total and not dry_run:
+        record_published_commit(store, get_head_commit())
+    
+    # 等待发布任务的最终状态，写入发布记录后再导出
+    status_summary = tracker.close()
+    if status_summary:
+        print(f"📬 发布任务状态: {status_summary}")
+    
+    # 保存发布记录
+    publisher.image_cache.save()
+    publisher.thumb_registry.save()
+    if dry_run:
+        print(f"🧪 演练完成，接口请求已写入 {dry_run}/，调用次数: {publisher.dry_run.api.calls}")
+    else:
+        store.export_json()
+    store.close()
+    
+    if http_stats is None:
+        http_stats = publisher.http.stats()
+    print(f"🔌 HTTP请求 {http_stats['requests']} 次，新建连接 {http_stats['connections']} 个，复用 {http_stats['reused']} 次")
+    publisher.http.close()
+    retry_stats = {k: v for k, v in publisher.retry.stats.items() if v['retries'] or v['failures']}
+    if retry_stats:
+        print(f"🔁 接口重试统计: {retry_stats}")
+    waited = {k: v for k, v in publisher.rate_limiter.stats().items() if v}
+    if waited:
+        print(f"⏱️  限流等待(秒): {waited}")
+    cache = publisher.image_cache
+    print(f"🖼️  图片缓存命中 {cache.hits} 次，未命中 {cache.misses} 次")
+    render = publisher.render_cache
+    print(f"📄 渲染缓存命中 {render.hits} 次，未命中 {render.misses} 次")
+    prep = publisher.image_prep
+    if prep.bytes_in:
+        print(f"🗜️  图片压缩 {prep.bytes_in} -> {prep.bytes_out} 字节")
+    
+    # 运行报告：各文章分阶段耗时及接口、缓存统计，create_summary.py 据此生成步骤摘要
+    report_path = publisher.metrics.write(
+        Path(dry_run) / 'run_report.json' if dry_run else None,
+        api=publisher.retry.stats,
+        http=http_stats,
+        rate_limit_wait=publisher.rate_limiter.stats(),
+        caches={
+            'image': {'hits': cache.hits, 'misses': cache.misses},
+            'render': {'hits': render.hits, 'misses': render.misses},
+        },
+        image_prep={'bytes_in': prep.bytes_in, 'bytes_out': prep.bytes_out},
+        publish_status=status_summary,
+    )
+    print(f"📊 运行报告已写入 {report_path}")
+    
+    print(f"\n🎉 发布完成！成功发布 {success_count}/{total} 篇文章")
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    articles = load_articles()
+    if not articles:
         return
     
     # 初始化发布器
-    publisher = WeChatPublisher()
+    publisher = WeChatPublisher(dry_run_dir=args.dry_run)
+    store, tracker = open_state(publisher, args.dry_run)
     
-    # 加载已发布记录
-    published_record_file = Path('config/published.json')
-    if published_record_file.exists():
-        with open(published_record_file, 'r', encoding='utf-8') as f:
-            published_record = json.load(f)
+    # 并发发布文章，接口频率由限流器控制；批量模式下多篇文章合并为一个草稿
+    if publisher.batch_size > 1:
+        print(f"📦 批量模式：每个草稿最多 {publisher.batch_size} 篇文章，顺序: {publisher.batch_order}")
+        outcomes = publisher.publish_batches(articles)
     else:
-        published_record = {}
+        outcomes = publisher.publish_concurrently(articles)
     
-    # 发布文章
+    # 发布结果在主线程中汇总
     success_count = 0
-    for article in articles:
-        try:
-            print(f"\n📝 正在发布: {article['title']}")
-            
-            result = publisher.publish_article(article)
-            
-            # 更新发布记录
-            file_key = str(Path(article['file_path']).relative_to('articles'))
-            published_record[file_key] = {
-                'title': article['title'],
-                'content_hash': article['content_hash'],
-                'published_time': result['published_time'],
-                'media_id': result['media_id'],
-                'publish_id': result['publish_id']
-            }
-            
-            print(f"✅ 发布成功！publish_id: {result['publish_id']}")
-            success_count += 1
-            
-            # 避免频率限制
-            time.sleep(3)
-            
-        except Exception as e:
-            print(f"❌ 发布失败: {e}")
-            continue
-    
-    # 保存发布记录
-    published_record_file.parent.mkdir(exist_ok=True)
-    with open(published_record_file, 'w', encoding='utf-8') as f:
-        json.dump(published_record, f, indent=2, ensure_ascii=False)
+    for article, result in outcomes:
+        success_count += record_outcome(publisher, store, tracker, article, result)
     
-    print(f"\n🎉 发布完成！成功发布 {success_count}/{len(articles)} 篇文章")
+    finish_run(publisher, store, tracker, args.dry_run, success_count, len(articles))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+微信接口HTTP会话层
+基于 requests.Session 复用 TCP/TLS 连接，统一超时并统计连接复用情况
+"""
+
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+# 默认超时：(连接超时, 读取超时)，单位秒
+DEFAULT_TIMEOUT = (5, 30)
+
+
+def request_sent(error):
+    """请求失败时是否可能已经发出：只有建立连接阶段的失败能确定服务器没有收到请求"""
+    if isinstance(error, requests.ConnectTimeout):
+        return False
+    if isinstance(error, requests.ConnectionError) and error.args:
+        return not isinstance(getattr(error.args[0], 'reason', None), (ConnectTimeoutError, NewConnectionError))
+    return True
+
+
+def counting_pool(pool_cls, on_connect):
+    """连接池的子类：每次真正建立 TCP 连接时调用 on_connect
+    
+    服务器关闭空闲连接后，urllib3 会在同一个连接对象上静默重连，按连接对象计数会把重连算作复用
+    """
+    base = pool_cls.ConnectionCls
+    
+    class CountingConnection(base):
+        def connect(self):
+            on_connect()
+            return super().connect()
+    
+    return type(pool_cls.__name__, (pool_cls,), {'ConnectionCls': CountingConnection})
+
+
+class CountingAdapter(HTTPAdapter):
+    """统计真实 TCP 连接数的 HTTPAdapter"""
+    
+    def __init__(self, *args, **kwargs):
+        self.connects = 0
+        self._connects_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+    
+    def _count_connect(self):
+        with self._connects_lock:
+            self.connects += 1
+    
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': counting_pool(HTTPConnectionPool, self._count_connect),
+            'https': counting_pool(HTTPSConnectionPool, self._count_connect),
+        }
+
+
+class WeChatSession:
+    """带连接池的微信接口会话"""
+
+    def __init__(self, pool_size=None, timeout=None, limiter=None):
+        self.pool_size = pool_size or int(os.getenv('WECHAT_HTTP_POOL_SIZE', '16'))
+        if timeout is None:
+            timeout = float(os.getenv('WECHAT_HTTP_TIMEOUT', '0')) or DEFAULT_TIMEOUT
+        self.timeout = timeout
+        self.limiter = limiter
+
+        self.adapter = CountingAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+
+    def request(self, method, url, timeout=None, **kwargs):
+        """发送请求，未指定超时时使用会话默认超时"""
+        if self.limiter:
+            self.limiter.acquire(url)
+        return self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        """统计请求数、新建连接数（真实的 TCP 连接，包括重连）与连接复用次数"""
+        requests_count = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_count += pool.num_requests
+        connections = self.adapter.connects
+        return {
+            'requests': requests_count,
+            'connections': connections,
+            'reused': max(requests_count - connections, 0)
+        }
+
+    def close(self):
+        self.session.close()
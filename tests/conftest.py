@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SAMPLES_DIR = REPO_ROOT / 'articles' / '2025'
+
+# 脚本以 scripts/ 为工作目录互相导入
+sys.path.insert(0, str(REPO_ROOT / 'scripts'))
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmark', '发布流程基准测试（tests/test_benchmark.py）')
+    group.addoption('--bench-sizes', default='10', help='语料文章数，逗号分隔，如 10,1000,10000（默认 10）')
+    group.addoption('--bench-output', default=None, help='结果 JSON 文件路径（默认不写入）')
+    group.addoption('--bench-publish-limit', type=int, default=200,
+                    help='每个语料完整发布的文章数上限，0 为全部发布（默认 200）')
+    group.addoption('--bench-latency', type=float, default=0.0, help='模拟接口的平均响应延迟（秒）')
+    group.addoption('--bench-budgets', action='store_true', help='耗时超出预算时失败（默认只记录预算）')
+
+
+# 与模拟接口返回的图片地址长度相同
+MOCK_IMAGE_URL = 'http://mmbiz.qpic.cn/mock/img_1/0?wx_fmt=jpeg'
+
+
+@pytest.fixture
+def publisher_env(tmp_path, monkeypatch):
+    """发布器所需的配置，缓存和媒体登记都放在临时目录中"""
+    monkeypatch.setenv('WECHAT_APP_ID', 'test')
+    monkeypatch.setenv('WECHAT_APP_SECRET', 'test')
+    monkeypatch.setenv('HELLOWE_CACHE_DIR', str(tmp_path / 'cache'))
+    (tmp_path / 'config').mkdir()
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def offline_publisher(publisher_env):
+    """不访问接口的发布器：图片上传直接返回固定地址"""
+    from wechat_publisher import WeChatPublisher
+
+    publisher = WeChatPublisher()
+    publisher.upload_image = lambda image_path: MOCK_IMAGE_URL
+    return publisher
+
+
+def sample_articles():
+    return sorted(path for path in SAMPLES_DIR.iterdir() if (path / 'index.md').exists())
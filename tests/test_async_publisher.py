@@ -0,0 +1,91 @@
+"""异步发布客户端：对本地模拟接口完整发布，接口调用与同步版一致"""
+
+import asyncio
+import threading
+from pathlib import Path
+
+import pytest
+
+from conftest import sample_articles
+
+pytest.importorskip('aiohttp')
+
+from async_publisher import AsyncWeChatPublisher  # noqa: E402
+from hashing import file_digest, local_image_refs  # noqa: E402
+from mock_wechat_server import serve  # noqa: E402
+from token_store import FileTokenStore  # noqa: E402
+
+
+@pytest.fixture
+def mock_api(publisher_env, monkeypatch):
+    """本地模拟接口，发布器通过 WECHAT_API_BASE 访问；返回 MockWeChatAPI"""
+    server = serve(port=0)
+    host, port = server.server_address[:2]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv('WECHAT_API_BASE', f'http://{host}:{port}/cgi-bin')
+    yield server.RequestHandlerClass.api
+    server.shutdown()
+    server.server_close()
+
+
+def articles():
+    return [{'title': article_dir.name, 'file_path': str(article_dir / 'index.md')} for article_dir in sample_articles()]
+
+
+def unique_images(articles):
+    digests = set()
+    for article in articles:
+        md_file = Path(article['file_path'])
+        for ref in local_image_refs(md_file.read_text(encoding='utf-8'), md_file.parent):
+            digests.add(file_digest(md_file.parent / ref))
+    return digests
+
+
+async def publish_all(client, articles):
+    async with client:
+        return [outcome async for outcome in client.publish_concurrently(articles)]
+
+
+def test_publish_against_mock_server(mock_api):
+    client = AsyncWeChatPublisher()
+    outcomes = asyncio.run(publish_all(client, articles()))
+
+    failures = [result for _, result in outcomes if isinstance(result, Exception)]
+    assert not failures, failures
+    assert len(outcomes) == len(articles())
+    assert all(result['media_id'] in mock_api.drafts and result['publish_id'] in mock_api.jobs for _, result in outcomes)
+    assert mock_api.calls['token'] == 1
+    assert mock_api.calls['media/uploadimg'] == len(unique_images(articles()))
+    assert mock_api.calls['draft/add'] == mock_api.calls['freepublish/submit'] == len(articles())
+    # 模拟接口保持连接，连接池中的连接被复用
+    stats = client.stats()
+    assert stats['requests'] == sum(mock_api.calls.values())
+    assert stats['reused'] > 0
+
+
+def test_expired_token_invalidated_off_event_loop(mock_api, publisher_env, monkeypatch):
+    monkeypatch.setenv('WECHAT_TOKEN_CACHE', str(publisher_env / 'token.json'))
+    invalidated = []
+    invalidate = FileTokenStore.invalidate
+
+    def recording_invalidate(self, app_id, access_token):
+        invalidated.append((access_token, threading.current_thread() is threading.main_thread()))
+        return invalidate(self, app_id, access_token)
+
+    monkeypatch.setattr(FileTokenStore, 'invalidate', recording_invalidate)
+
+    async def run():
+        async with AsyncWeChatPublisher() as client:
+            token = await client.get_access_token()
+            # 模拟 token 在微信侧失效：下一次调用返回 40001，丢弃后重新获取
+            mock_api.tokens.discard(token)
+            media_id = await client.upload_thumb_media(str(sample_articles()[1] / 'cover.png'))
+            return token, media_id, client.publisher.token_store.load('test')[0]
+
+    token, media_id, stored = asyncio.run(run())
+
+    assert media_id in mock_api.materials
+    # 文件锁在线程池中获取，事件循环线程（主线程）不阻塞
+    assert invalidated == [(token, False)]
+    assert stored not in (None, token)
+    assert mock_api.calls['token'] == 2
@@ -0,0 +1,95 @@
+"""批量模式：分篇装入多图文草稿，同一篇文章的分篇保持相邻且有序"""
+
+from content_budget import ContentBudget
+from wechat_publisher import DRAFT_MAX_ARTICLES, DraftBatches, plan_batches
+
+
+def parts(name, count):
+    return [f'{name}{index}' for index in range(1, count + 1)]
+
+
+def draft_parts(name, count):
+    return [{'article': {'title': title}} for title in parts(name, count)]
+
+
+def layout(groups):
+    return [[part for _, part in group] for group in groups]
+
+
+def test_empty_input():
+    assert plan_batches([], DRAFT_MAX_ARTICLES) == []
+    assert list(DraftBatches([], [], DRAFT_MAX_ARTICLES).groups()) == []
+
+
+def test_exactly_one_full_draft():
+    prepared = [parts(f'a{index}-', 1) for index in range(DRAFT_MAX_ARTICLES)]
+
+    groups = plan_batches(prepared, DRAFT_MAX_ARTICLES)
+
+    assert len(groups) == 1
+    assert [index for index, _ in groups[0]] == list(range(DRAFT_MAX_ARTICLES))
+
+
+def test_one_more_than_full_draft():
+    prepared = [parts(f'a{index}-', 1) for index in range(DRAFT_MAX_ARTICLES + 1)]
+
+    assert [len(group) for group in plan_batches(prepared, DRAFT_MAX_ARTICLES)] == [DRAFT_MAX_ARTICLES, 1]
+
+
+def test_split_article_moves_whole_to_next_draft():
+    groups = plan_batches([parts('a', 6), parts('b', 3), parts('c', 2)], DRAFT_MAX_ARTICLES)
+
+    # b 放不进第一个草稿的剩余位置，整篇移到下一个草稿，不跨草稿拆开
+    assert layout(groups) == [parts('a', 6), parts('b', 3) + parts('c', 2)]
+
+
+def test_split_article_larger_than_draft_keeps_order():
+    groups = plan_batches([parts('a', 1), parts('b', 10), parts('c', 1)], DRAFT_MAX_ARTICLES)
+
+    assert layout(groups) == [['a1'], parts('b', 10)[:8], parts('b', 10)[8:] + ['c1']]
+
+
+def test_split_by_content_budget(offline_publisher):
+    offline_publisher.content_budget = ContentBudget(max_chars=100)
+    html = '<section>' + ''.join(f'<p>第{index}段' + '文' * 60 + '</p>' for index in range(5)) + '</section>'
+    article = {'title': '长文', 'file_path': 'articles/long/index.md'}
+
+    split = offline_publisher.build_parts(article, '# 长文', html, 'thumb', 'thumb.jpg')
+    groups = plan_batches([split], 3)
+
+    titles = [[part['article']['title'] for _, part in group] for group in groups]
+    assert titles == [['长文（1/5）', '长文（2/5）', '长文（3/5）'], ['长文（4/5）', '长文（5/5）']]
+
+
+def test_results_collected_per_article():
+    articles = [{'file_path': name} for name in ('a', 'b', 'c')]
+    batches = DraftBatches(articles, [draft_parts('a', 2), RuntimeError('render failed'), draft_parts('c', 1)], 2)
+
+    assert [(article, str(error)) for article, error in batches.failures] == [(articles[1], 'render failed')]
+    outcomes = []
+    for draft, (group, group_parts, keys) in enumerate(batches.groups(), 1):
+        outcomes.append(keys)
+        outcomes.extend(batches.done(group, f'draft_{draft}', f'publish_{draft}', None))
+
+    article_a, article_c = outcomes[1], outcomes[3]
+    assert outcomes[0] == ['a'] and outcomes[2] == ['c']
+    assert article_a[0] is articles[0]
+    assert article_a[1]['parts'] == [
+        {'media_id': 'draft_1', 'publish_id': 'publish_1', 'article_idx': 1},
+        {'media_id': 'draft_1', 'publish_id': 'publish_1', 'article_idx': 2},
+    ]
+    assert article_c[1]['media_id'] == 'draft_2'
+
+
+def test_failed_article_skips_remaining_parts():
+    articles = [{'file_path': name} for name in ('a', 'b')]
+    batches = DraftBatches(articles, [draft_parts('a', 3), draft_parts('b', 1)], 2)
+    error = RuntimeError('draft failed')
+
+    groups = batches.groups()
+    group, _, _ = next(groups)
+    assert list(batches.fail(group, error)) == [(articles[0], error)]
+
+    # a 的第 3 个分篇不再创建草稿，只剩 b
+    remaining = [group_parts for _, group_parts, _ in groups]
+    assert remaining == [draft_parts('b', 1)]
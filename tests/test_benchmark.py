@@ -0,0 +1,309 @@
+"""
+发布流程基准测试
+以 articles/2025/* 为样本生成合成语料，分别计时变更检测扫描、Markdown 渲染（process_markdown_content）、
+图片预处理，以及对本地模拟接口的完整发布（publish_article），并检查接口调用次数和缓存命中。
+每个语料在独立的临时目录中运行，缓存均从空开始；同一阶段再跑一次得到缓存命中时的耗时：
+
+    uv run pytest tests/test_benchmark.py --bench-sizes 10,1000,10000 --bench-output benchmark.json
+
+默认只跑 10 篇的语料，随普通测试一起执行；结果写入 --bench-output 指定的 JSON。
+耗时预算默认只记录不检查，在稳定的机器上加 --bench-budgets 检查
+"""
+
+import contextlib
+import json
+import os
+import platform
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from article_index import ArticleIndex
+from detect_changes import get_head_commit, scan_articles
+from hashing import file_digest, local_image_refs
+from image_prep import THUMB_MAX_BYTES, ImagePreprocessor
+from mock_wechat_server import serve
+from wechat_publisher import DEFAULT_THUMB_PATH, THUMB_NAMES, WeChatPublisher
+
+from conftest import sample_articles
+
+pytestmark = pytest.mark.benchmark
+
+# 基准测试不受真实接口的频率限制
+BENCHMARK_ENV = {
+    'WECHAT_APP_ID': 'benchmark',
+    'WECHAT_APP_SECRET': 'benchmark',
+    'WECHAT_RATE_DEFAULT': '100000',
+    'WECHAT_RATE_LIMITS': 'draft/add=100000,freepublish/submit=100000',
+}
+
+# 各阶段的耗时预算：(固定开销秒数, 每项毫秒数)，约为开发机实测值的 3~10 倍；
+# 固定开销覆盖冷启动时只发生一次的图片编码和上传。较慢的 runner 用 BENCHMARK_BUDGET_SCALE 放宽
+BUDGETS = {
+    'detect_cold': (1.0, 5),
+    'detect_warm': (0.5, 1),
+    'images_cold': (5.0, 2),
+    'images_warm': (0.5, 1),
+    'render_cold': (5.0, 100),
+    'render_warm': (0.5, 10),
+    'publish': (5.0, 150),
+}
+
+
+def link_or_copy(source, target):
+    """样本中的图片用硬链接共享，跨文件系统时退回复制"""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def make_corpus(root, size, samples):
+    """按样本轮流生成 size 篇文章，每篇内容不同（标题和末尾加序号），图片与样本相同"""
+    for index in range(size):
+        sample = samples[index % len(samples)]
+        target = root / 'articles' / f'{index // 1000:02d}' / f'{index:05d}-{sample.name}'
+        shutil.copytree(sample, target, copy_function=link_or_copy, ignore=shutil.ignore_patterns('index.md'))
+        content = (sample / 'index.md').read_text(encoding='utf-8')
+        first_line, sep, rest = content.partition('\n')
+        if first_line.startswith('# '):
+            content = f'{first_line} #{index}{sep}{rest}'
+        (target / 'index.md').write_text(f'{content.rstrip()}\n\n> 基准测试样本 #{index}\n', encoding='utf-8')
+
+
+def timed(func, items):
+    """计时执行，返回 (结果, 阶段统计)"""
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    return result, {
+        'seconds': round(seconds, 4),
+        'items': items,
+        'per_item_ms': round(seconds * 1000 / items, 4) if items else None,
+    }
+
+
+def article_images(article):
+    """文章引用的本地图片路径"""
+    md_file = Path(article['file_path'])
+    return [str(md_file.parent / ref) for ref in local_image_refs(md_file.read_text(encoding='utf-8'), md_file.parent)]
+
+
+def article_thumb(article):
+    """发布时使用的缩略图，与 WeChatPublisher.find_thumb 的查找顺序相同"""
+    article_dir = Path(article['file_path']).parent
+    for name in THUMB_NAMES:
+        if (article_dir / name).exists():
+            return article_dir / name
+    return DEFAULT_THUMB_PATH
+
+
+class Corpus:
+    """一个合成语料及其运行环境"""
+
+    def __init__(self, size, workspace):
+        self.size = size
+        self.workspace = workspace
+        self.md_files = sorted(str(path) for path in Path('articles').rglob('index.md'))
+        self.articles = None
+
+    def publisher(self, stage):
+        """创建缓存为空的发布器：每个阶段使用独立的缓存目录和媒体登记"""
+        os.environ['HELLOWE_CACHE_DIR'] = str(self.workspace / 'cache' / stage)
+        for name in ('image_cache.json', 'thumb_media.json'):
+            (self.workspace / 'config' / name).unlink(missing_ok=True)
+        return WeChatPublisher()
+
+
+@pytest.fixture(scope='session')
+def bench_report(request):
+    """收集各语料、各阶段的结果，测试结束时写入 JSON"""
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'commit': None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'samples': [sample.name for sample in sample_articles()],
+        'publish_limit': request.config.getoption('bench_publish_limit'),
+        'latency': request.config.getoption('bench_latency'),
+        'corpora': {},
+    }
+    with contextlib.suppress(Exception):
+        report['commit'] = get_head_commit()
+    yield report
+
+    output = request.config.getoption('bench_output')
+    if output and report['corpora']:
+        path = Path(output)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        report['corpora'] = [{'size': size, 'stages': stages} for size, stages in sorted(report['corpora'].items())]
+        path.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+
+
+@pytest.fixture(scope='session')
+def mock_api(request):
+    """本地模拟接口，返回 (接口地址, MockWeChatAPI)"""
+    server = serve(port=0, latency=request.config.getoption('bench_latency'))
+    host, port = server.server_address[:2]
+    threading.Thread(target=server.serve_forever, name='mock-wechat', daemon=True).start()
+    yield f'http://{host}:{port}/cgi-bin', server.RequestHandlerClass.api
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope='module')
+def corpus(request, tmp_path_factory, mock_api, bench_report):
+    """生成语料并切换到语料目录（变更检测和发布脚本都以仓库根目录为工作目录，文章路径为 articles/...）"""
+    size = request.param
+    workspace = tmp_path_factory.mktemp(f'bench-{size}')
+    (workspace / 'config').mkdir()
+    _, generate = timed(lambda: make_corpus(workspace, size, sample_articles()), size)
+    bench_report['corpora'].setdefault(size, {})['generate'] = generate
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(workspace)
+        for name, value in dict(BENCHMARK_ENV, WECHAT_API_BASE=mock_api[0]).items():
+            patch.setenv(name, value)
+        patch.setenv('HELLOWE_CACHE_DIR', str(workspace / 'cache'))
+        corpus = Corpus(size, workspace)
+        scanned = scan_articles(corpus.md_files)
+        corpus.articles = [scanned[md_file] for md_file in corpus.md_files]
+        yield corpus
+
+
+def pytest_generate_tests(metafunc):
+    if 'corpus' in metafunc.fixturenames:
+        sizes = [int(size) for size in metafunc.config.getoption('bench_sizes').split(',') if size.strip()]
+        metafunc.parametrize('corpus', sizes, indirect=True, scope='module', ids=lambda size: f'n{size}')
+
+
+@pytest.fixture
+def check_budget(request):
+    """耗时预算：预算总是写入结果；只有指定 --bench-budgets 时超出预算才失败，共享的 CI runner 上耗时波动很大"""
+    enforce = request.config.getoption('bench_budgets')
+
+    def check(stage, stats):
+        fixed, per_item_ms = BUDGETS[stage]
+        budget = (fixed + per_item_ms * stats['items'] / 1000) * float(os.getenv('BENCHMARK_BUDGET_SCALE', '1'))
+        stats['budget_seconds'] = round(budget, 3)
+        if enforce:
+            assert stats['seconds'] <= budget, f"{stage}: {stats['seconds']:.3f}s（{stats['items']} 项），超出预算 {budget:.3f}s"
+
+    return check
+
+
+@pytest.fixture
+def record(bench_report, corpus):
+    """记录一个阶段的结果"""
+    def record(stage, stats):
+        bench_report['corpora'].setdefault(corpus.size, {})[stage] = stats
+    return record
+
+
+def test_detect(corpus, record, check_budget):
+    """变更检测：首次全量扫描，以及索引命中时的再次扫描"""
+    index = ArticleIndex(corpus.workspace / 'cache' / 'article_index.json')
+    articles, cold = timed(lambda: scan_articles(corpus.md_files, index), corpus.size)
+    _, warm = timed(lambda: scan_articles(corpus.md_files, index), corpus.size)
+    warm['index_hits'] = index.hits
+    record('detect_cold', cold)
+    record('detect_warm', warm)
+
+    assert len(articles) == corpus.size
+    assert index.hits == corpus.size
+    check_budget('detect_cold', cold)
+    check_budget('detect_warm', warm)
+
+
+def test_images(corpus, record, check_budget):
+    """图片预处理：相同内容的图片只编码一次，其余命中处理结果缓存"""
+    cache_dir = corpus.workspace / 'cache' / 'images'
+    prep = ImagePreprocessor(cache_dir)
+    image_paths = [path for article in corpus.articles for path in article_images(article)]
+
+    def prepare_all():
+        for path in image_paths:
+            if Path(path).name.startswith('cover.'):
+                prep.prepare(path, max_bytes=THUMB_MAX_BYTES, formats=('JPEG',))
+            else:
+                prep.prepare(path)
+
+    _, cold = timed(prepare_all, len(image_paths))
+    cold.update(bytes_in=prep.bytes_in, bytes_out=prep.bytes_out)
+    encoded = len(list(cache_dir.iterdir()))
+    _, warm = timed(prepare_all, len(image_paths))
+    cold['encoded'] = encoded
+    record('images_cold', cold)
+    record('images_warm', warm)
+
+    # 合成语料的图片都来自样本，处理结果只取决于内容
+    unique = {(file_digest(path), Path(path).name.startswith('cover.')) for path in image_paths}
+    assert encoded == len(unique)
+    assert len(list(cache_dir.iterdir())) == encoded
+    check_budget('images_cold', cold)
+    check_budget('images_warm', warm)
+
+
+def test_render(corpus, record, check_budget):
+    """渲染：process_markdown_content（渲染、内联样式、压缩并替换图片地址），第二遍命中渲染缓存"""
+    publisher = corpus.publisher('render')
+    sources = [
+        (Path(article['file_path']).read_text(encoding='utf-8'), Path(article['file_path']).parent)
+        for article in corpus.articles
+    ]
+
+    def render_all():
+        return sum(len(publisher.process_markdown_content(content, article_dir)) for content, article_dir in sources)
+
+    html_chars, cold = timed(render_all, len(sources))
+    cold['html_chars'] = html_chars
+    _, warm = timed(render_all, len(sources))
+    warm.update(cache_hits=publisher.render_cache.hits, cache_misses=publisher.render_cache.misses)
+    record('render_cold', cold)
+    record('render_warm', warm)
+
+    assert publisher.render_cache.misses == len(sources)
+    assert publisher.render_cache.hits == len(sources)
+    check_budget('render_cold', cold)
+    check_budget('render_warm', warm)
+
+
+def test_publish(corpus, record, check_budget, mock_api, request):
+    """完整发布：与 wechat_publisher.py 相同的并发流程（publish_article），访问本地模拟接口"""
+    api = mock_api[1]
+    limit = request.config.getoption('bench_publish_limit')
+    articles = corpus.articles[:limit] if limit else corpus.articles
+    publisher = corpus.publisher('publish')
+    calls_before = dict(api.calls)
+
+    def publish_all():
+        return [result for _, result in publisher.publish_concurrently(articles)]
+
+    results, stats = timed(publish_all, len(articles))
+    failures = [result for result in results if isinstance(result, Exception)]
+    stats['failed'] = len(failures)
+    stats['api_calls'] = calls = {
+        endpoint: count - calls_before.get(endpoint, 0)
+        for endpoint, count in sorted(api.calls.items())
+        if count != calls_before.get(endpoint, 0)
+    }
+    stats['rate_limit_wait'] = publisher.rate_limiter.stats()
+    record('publish', stats)
+
+    assert not failures, failures[:3]
+    # 相同内容的图片和缩略图在整次运行中只上传一次，token 只获取一次
+    unique_images = {file_digest(path) for article in articles for path in article_images(article)}
+    unique_thumbs = {file_digest(article_thumb(article)) for article in articles}
+    assert calls.get('media/uploadimg', 0) == len(unique_images)
+    assert calls.get('material/add_material', 0) == len(unique_thumbs)
+    # 每篇文章的缩略图要么新上传、要么复用一次，创建草稿时不再重复计数
+    assert publisher.metrics.counters.get('thumb_reused', 0) == len(articles) - len(unique_thumbs)
+    assert calls.get('token', 0) == 1
+    assert calls.get('draft/add', 0) == len(articles)
+    assert calls.get('freepublish/submit', 0) == len(articles)
+    check_budget('publish', stats)
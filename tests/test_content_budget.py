@@ -0,0 +1,126 @@
+"""正文长度预算：无损压缩（样式去重）优先于拆分，且不改变渲染效果"""
+
+import re
+
+from content_budget import (
+    CONTENT_MAX_CHARS, PRESET_PROPERTIES, ContentBudget, compact_value, dedupe_styles, parse_style, parse_tree
+)
+from css_inliner import INHERITED_PROPERTIES, CSSInliner
+from html_minifier import minify_html
+from renderer import WeChatRenderer
+
+from conftest import SAMPLES_DIR, sample_articles
+
+# 正文样式写在每个段落和列表项上，而不是根容器上
+VERBOSE_CSS = """
+body { font-size: 17px; line-height: 1.75; color: #2c3e50; }
+h2 { font-size: 1.6em; color: #34495e; margin: 2.5em 0 1.2em; }
+p { margin: 1.5em 0; text-align: justify; line-height: 1.8; color: #34495e; }
+li { margin: 1em 0; line-height: 1.7; color: #34495e; }
+strong { color: #2c3e50; font-weight: 700; }
+a { color: #2c3e50; }
+"""
+
+
+def text_styles(html):
+    """每段文本最终继承到的样式，用于比较去重前后的渲染效果"""
+    result = []
+
+    def walk(node, inherited):
+        for child in node.children:
+            if isinstance(child, str):
+                if child.strip() and not child.startswith('<'):
+                    result.append((child, tuple(sorted(inherited.items()))))
+                continue
+            style = parse_style(re.search(r'style="([^"]*)"', child.start).group(1)) if 'style="' in child.start else {}
+            computed = dict(inherited)
+            # 浏览器默认样式覆盖继承值
+            for name in PRESET_PROPERTIES.get(child.tag, ()):
+                computed[name] = f'preset:{child.tag}'
+            computed.update((name, compact_value(value)) for name, value in style.items() if name in INHERITED_PROPERTIES)
+            walk(child, computed)
+
+    walk(parse_tree(html), {})
+    return result
+
+
+def render_verbose(article_dir):
+    html = WeChatRenderer().render((article_dir / 'index.md').read_text(encoding='utf-8'))['html']
+    return minify_html(CSSInliner(css=VERBOSE_CSS).inline(html))
+
+
+def dedupe(html):
+    tree = parse_tree(html)
+    dedupe_styles(tree)
+    return tree.html()
+
+
+def test_dedupe_is_lossless_on_samples():
+    for article_dir in sample_articles():
+        html = render_verbose(article_dir)
+        deduped = dedupe(html)
+        assert len(deduped) < len(html)
+        assert text_styles(deduped) == text_styles(html)
+
+
+def test_dedupe_avoids_split():
+    html = render_verbose(SAMPLES_DIR / '03-developer-daily')
+    deduped = dedupe(html)
+    budget = ContentBudget(max_chars=len(deduped) + 1)
+
+    assert len(html) > budget.max_chars
+    assert budget.fit(html) == [deduped]
+
+
+def test_shared_styles_hoisted_to_parent():
+    items = ''.join(f'<li style="margin:0;color:#333333;line-height:1.7">第{i}项</li>' for i in range(10))
+    html = f'<div style="color:#2c3e50"><ul>{items}</ul><p>正文</p></div>'
+    deduped = dedupe(html)
+
+    assert deduped.count('color:#333') == 1
+    assert '<ul style="color:#333;line-height:1.7">' in deduped
+    assert text_styles(deduped) == text_styles(html)
+
+
+def test_children_without_declaration_keep_inherited_value():
+    paragraphs = ''.join('<p style="color:#34495e">段落</p>' for _ in range(5))
+    html = f'<div style="color:#2c3e50">{paragraphs}<blockquote>引用</blockquote></div>'
+    deduped = dedupe(html)
+
+    assert '<blockquote style="color:#2c3e50">' in deduped
+    assert text_styles(deduped) == text_styles(html)
+
+
+def test_preset_properties_kept():
+    html = '<div style="color:#2c3e50"><p>见 <a href="#" style="color:#2c3e50">链接</a></p></div>'
+
+    assert 'style="color:#2c3e50">链接' in dedupe(html)
+
+
+def sized_article(total_chars):
+    """根容器内若干段落，总长度恰好为 total_chars，段落之间没有空白"""
+    prefix, suffix = '<section style="color:#34495e">', '</section>'
+    paragraph = '<p>' + '文' * 993 + '</p>'
+    count, rest = divmod(total_chars - len(prefix) - len(suffix), len(paragraph))
+    paragraphs = [paragraph] * count + ['<p>' + '末' * (rest - len('<p></p>')) + '</p>']
+    return prefix + ''.join(paragraphs) + suffix, paragraphs
+
+
+def test_split_at_limit():
+    budget = ContentBudget()
+    html, paragraphs = sized_article(CONTENT_MAX_CHARS)
+
+    parts = budget.fit(html)
+
+    # 恰好 2 万字符同样超限，在段落边界拆分，每篇都带上根容器
+    assert len(parts) == 2
+    for part in parts:
+        assert len(part) < CONTENT_MAX_CHARS
+        assert part.startswith('<section style="color:#34495e"><p>') and part.endswith('</p></section>')
+    assert ''.join(part[len('<section style="color:#34495e">'):-len('</section>')] for part in parts) == ''.join(paragraphs)
+
+
+def test_just_below_limit_not_split():
+    html, _ = sized_article(CONTENT_MAX_CHARS - 1)
+
+    assert ContentBudget().fit(html) == [html]
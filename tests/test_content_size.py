@@ -0,0 +1,20 @@
+"""样例文章的草稿正文：内联样式后不应比原来（<style> 块 + HTML）更大，也不应被拆分成多篇"""
+
+import pytest
+
+from conftest import sample_articles
+
+# 内联样式之前的正文字符数（<style> 块 + 渲染结果，图片地址与 MOCK_IMAGE_URL 等长）
+BASELINE_CHARS = {
+    '01-hello-world': 9226,
+    '02-image-test': 12349,
+    '03-developer-daily': 13896,
+}
+
+
+@pytest.mark.parametrize('article_dir', sample_articles(), ids=lambda path: path.name)
+def test_sample_article_not_larger_than_baseline(offline_publisher, article_dir):
+    html = offline_publisher.process_markdown_content((article_dir / 'index.md').read_text(encoding='utf-8'), article_dir)
+
+    assert len(html) <= BASELINE_CHARS[article_dir.name]
+    assert offline_publisher.content_budget.fit(html) == [html]
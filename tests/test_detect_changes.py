@@ -0,0 +1,106 @@
+"""变更检测：解析 git diff --name-status -z 的输出，比较上次发布以来的整个提交范围"""
+
+import subprocess
+
+import pytest
+
+from detect_changes import article_for_path, get_git_changes, parse_name_status
+
+
+def test_parse_modified_added_deleted():
+    output = 'M\0articles/2025/a/index.md\0A\0articles/2025/b/cover.png\0D\0articles/2025/c/index.md\0'
+
+    assert parse_name_status(output) == [
+        ('M', 'articles/2025/a/index.md', None),
+        ('A', 'articles/2025/b/cover.png', None),
+        ('D', 'articles/2025/c/index.md', None),
+    ]
+
+
+def test_parse_rename_and_copy():
+    output = 'R100\0articles/old/index.md\0articles/new/index.md\0C075\0a.md\0b.md\0M\0README.md\0'
+
+    # 重命名与复制：状态带相似度，先是原路径再是新路径
+    assert parse_name_status(output) == [
+        ('R', 'articles/new/index.md', 'articles/old/index.md'),
+        ('C', 'b.md', 'a.md'),
+        ('M', 'README.md', None),
+    ]
+
+
+def test_parse_paths_with_spaces_and_tabs():
+    output = 'R087\0articles/旧 标题/index.md\0articles/新\t标题/index.md\0'
+
+    assert parse_name_status(output) == [('R', 'articles/新\t标题/index.md', 'articles/旧 标题/index.md')]
+
+
+def test_parse_empty():
+    assert parse_name_status('') == []
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for args in (['init', '-q'], ['config', 'user.email', 'test@example.com'], ['config', 'user.name', 'test']):
+        git(*args)
+    return tmp_path
+
+
+def git(*args):
+    return subprocess.run(['git', *args], check=True, capture_output=True, text=True).stdout.strip()
+
+
+def commit(repo, files=(), removed=(), renamed=()):
+    for path, content in dict(files).items():
+        (repo / path).parent.mkdir(parents=True, exist_ok=True)
+        (repo / path).write_text(content, encoding='utf-8')
+    for path in removed:
+        git('rm', '-q', path)
+    for old, new in renamed:
+        (repo / new).parent.mkdir(parents=True, exist_ok=True)
+        git('mv', old, new)
+    git('add', '-A')
+    git('commit', '-q', '-m', 'update')
+    return git('rev-parse', 'HEAD')
+
+
+def test_changes_since_last_published_commit(repo):
+    body = '# 标题\n\n' + '正文内容。\n' * 20
+    base = commit(repo, {'articles/a/index.md': body, 'articles/b/index.md': body + 'b', 'articles/c/index.md': body + 'c'})
+    commit(repo, {'articles/a/index.md': body + '修改'})
+    commit(repo, removed=['articles/b/index.md'])
+    commit(repo, renamed=[('articles/c/index.md', 'articles/d/index.md')], files={'articles/e/index.md': '# 新文章'})
+
+    # 多个提交的变更合并为一次比较，而不只是最近一次提交
+    assert sorted(get_git_changes(base)) == [
+        ('A', 'articles/e/index.md', None),
+        ('D', 'articles/b/index.md', None),
+        ('M', 'articles/a/index.md', None),
+        ('R', 'articles/d/index.md', 'articles/c/index.md'),
+    ]
+    # 没有上次发布的提交时只比较最近一次提交
+    assert sorted(get_git_changes()) == [
+        ('A', 'articles/e/index.md', None),
+        ('R', 'articles/d/index.md', 'articles/c/index.md'),
+    ]
+
+
+def test_unreachable_commit_falls_back_to_last_commit(repo):
+    commit(repo, {'articles/a/index.md': '# A'})
+    commit(repo, {'articles/b/index.md': '# B'})
+
+    assert get_git_changes('0' * 40) == [('A', 'articles/b/index.md', None)]
+
+
+def test_first_commit_lists_all_files(repo):
+    commit(repo, {'articles/a/index.md': '# A', 'articles/a/cover.png': 'png'})
+
+    assert sorted(get_git_changes()) == [('A', 'articles/a/cover.png', None), ('A', 'articles/a/index.md', None)]
+
+
+def test_article_for_image_change(repo):
+    commit(repo, {'articles/2025/a/index.md': '# A', 'articles/2025/a/images/one.png': 'png'})
+
+    assert article_for_path('articles/2025/a/images/one.png') == 'articles/2025/a/index.md'
+    assert article_for_path('articles/2025/a/index.md') == 'articles/2025/a/index.md'
+    assert article_for_path('README.md') is None
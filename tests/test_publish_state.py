@@ -0,0 +1,41 @@
+"""发布状态存储：按路径和内容摘要查询发布记录"""
+
+import pytest
+
+from detect_changes import find_renamed
+from publish_state import PublishStateStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = PublishStateStore(db_path=tmp_path / 'state.db')
+    yield store
+    store.close()
+
+
+def record(content_hash):
+    return {'title': '标题', 'content_hash': content_hash, 'published_time': '2025-01-01T00:00:00'}
+
+
+def test_find_by_hash_uses_index(store):
+    store.put('2025/a/index.md', record('aaa'))
+    store.put('2025/b/index.md', record('bbb'))
+    store.put('2025/c/index.md', record('aaa'))
+
+    assert store.find_by_hash('aaa') == ['2025/a/index.md', '2025/c/index.md']
+    assert store.find_by_hash('ccc') == []
+    plan = store.conn.execute('EXPLAIN QUERY PLAN SELECT path FROM articles WHERE content_hash = ?', ('aaa',)).fetchall()
+    assert any('idx_articles_hash' in row[-1] for row in plan)
+
+
+def test_find_renamed_skips_existing_articles(store, tmp_path):
+    store.put('2025/old/index.md', record('aaa'))
+    store.put('2025/kept/index.md', record('bbb'))
+    (tmp_path / 'articles' / '2025' / 'kept').mkdir(parents=True)
+    (tmp_path / 'articles' / '2025' / 'kept' / 'index.md').write_text('# 保留', encoding='utf-8')
+
+    # 原路径已不存在：视为重命名；原文章仍在：是一篇内容相同的新文章
+    assert find_renamed(store, 'aaa') == '2025/old/index.md'
+    assert find_renamed(store, 'bbb') is None
+    assert find_renamed(store, 'ccc') is None
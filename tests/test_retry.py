@@ -0,0 +1,144 @@
+"""接口重试：按 errcode 分类重试，非幂等接口结果未知时不重复创建草稿或再次群发"""
+
+import pytest
+import requests
+
+from retry import FATAL, RETRYABLE, TOKEN_EXPIRED, UNCERTAIN, WeChatAPIError, classify_errcode, classify_transport_error
+
+
+@pytest.fixture
+def publisher(publisher_env):
+    from wechat_publisher import WeChatPublisher
+
+    publisher = WeChatPublisher(dry_run_dir='dry')
+    publisher.retry.base_delay = 0
+    return publisher
+
+
+def script(publisher, endpoint, *steps):
+    """按顺序替换 endpoint 前几次调用的结果；step(send) 可先把请求交给模拟接口处理再抛出网络错误"""
+    call = publisher.dry_run.call
+    steps = list(steps)
+    attempts = []
+
+    def scripted(name, *args, **kwargs):
+        def send():
+            return call(name, *args, **kwargs)
+        if name != endpoint:
+            return send()
+        attempts.append(name)
+        return steps.pop(0)(send) if steps else send()
+
+    publisher.dry_run.call = scripted
+    return attempts
+
+
+def busy(send):
+    return {'errcode': -1, 'errmsg': 'system busy'}
+
+
+def lost_response(send):
+    """服务器已处理请求，响应丢失"""
+    send()
+    raise requests.ReadTimeout('read timed out')
+
+
+def lost_request(send):
+    """请求已发出但服务器没有处理，客户端同样只看到读取超时"""
+    raise requests.ReadTimeout('read timed out')
+
+
+def not_connected(send):
+    raise requests.ConnectTimeout('connect timed out')
+
+
+def create_draft(publisher, title='标题'):
+    thumb_media_id = publisher.dry_run.call('material/add_material', publisher.get_access_token(), 'type=thumb')['media_id']
+    return publisher.create_draft(title, '<p>正文</p>', '', '摘要', thumb_media_id, '')
+
+
+def test_classification():
+    assert classify_errcode(-1) == RETRYABLE
+    assert classify_errcode(45009) == RETRYABLE
+    assert classify_errcode(42001) == TOKEN_EXPIRED
+    assert classify_errcode(45002) == FATAL
+    assert classify_transport_error('media/uploadimg', sent=True) == RETRYABLE
+    assert classify_transport_error('draft/add', sent=False) == RETRYABLE
+    assert classify_transport_error('draft/add', sent=True) == UNCERTAIN
+    assert classify_transport_error('freepublish/submit', sent=True) == UNCERTAIN
+
+
+def test_transient_errcode_retried(publisher):
+    attempts = script(publisher, 'draft/add', busy, busy)
+
+    media_id = create_draft(publisher)
+
+    assert len(attempts) == 3
+    assert list(publisher.dry_run.api.drafts) == [media_id]
+    assert publisher.retry.stats['draft/add']['retries'] == 2
+
+
+def test_fatal_errcode_raised(publisher):
+    attempts = script(publisher, 'draft/add', lambda send: {'errcode': 45002, 'errmsg': 'content size out of limit'})
+
+    with pytest.raises(WeChatAPIError) as error:
+        create_draft(publisher)
+
+    assert error.value.errcode == 45002
+    assert len(attempts) == 1
+    assert publisher.retry.stats['draft/add']['failures'] == 1
+
+
+def test_expired_token_refreshed(publisher):
+    token = publisher.get_access_token()
+    script(publisher, 'draft/add', lambda send: {'errcode': 42001, 'errmsg': 'access_token expired'})
+
+    create_draft(publisher)
+
+    assert publisher.access_token != token
+    assert len(publisher.dry_run.api.drafts) == 1
+
+
+def test_created_draft_reconciled_instead_of_duplicated(publisher):
+    attempts = script(publisher, 'draft/add', lost_response)
+
+    media_id = create_draft(publisher)
+
+    # 读取超时后在草稿列表中找到已创建的草稿，不再发送第二次
+    assert len(attempts) == 1
+    assert list(publisher.dry_run.api.drafts) == [media_id]
+    assert publisher.dry_run.api.calls['draft/batchget'] == 1
+
+
+def test_lost_draft_request_retried(publisher):
+    create_draft(publisher, title='更早的草稿')
+    attempts = script(publisher, 'draft/add', lost_request)
+
+    media_id = create_draft(publisher)
+
+    # 草稿列表中没有同名的新草稿：确认未创建后才重试
+    assert len(attempts) == 2
+    assert len(publisher.dry_run.api.drafts) == 2
+    assert publisher.dry_run.api.drafts[media_id]['articles'][0]['title'] == '标题'
+
+
+def test_connect_failure_retried_without_lookup(publisher):
+    attempts = script(publisher, 'draft/add', not_connected)
+
+    create_draft(publisher)
+
+    assert len(attempts) == 2
+    assert len(publisher.dry_run.api.drafts) == 1
+    assert 'draft/batchget' not in publisher.dry_run.api.calls
+
+
+def test_uncertain_publish_not_retried(publisher):
+    media_id = create_draft(publisher)
+    attempts = script(publisher, 'freepublish/submit', lost_response)
+
+    with pytest.raises(requests.ReadTimeout):
+        publisher.publish_draft(media_id)
+
+    # 发布结果无法确认，再次提交可能重复群发
+    assert len(attempts) == 1
+    assert len(publisher.dry_run.api.jobs) == 1
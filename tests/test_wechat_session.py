@@ -0,0 +1,61 @@
+"""HTTP 会话：连接复用统计与服务器实际接受的 TCP 连接一致"""
+
+import threading
+
+import pytest
+
+from mock_wechat_server import serve
+from wechat_session import WeChatSession
+
+
+@pytest.fixture
+def server():
+    server = serve(port=0)
+    server.accepted = 0
+    get_request = server.get_request
+
+    def counting_get_request():
+        server.accepted += 1
+        return get_request()
+
+    server.get_request = counting_get_request
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# HTTP/1.0 时服务器每次响应后关闭连接，urllib3 在同一个连接对象上重连
+@pytest.mark.parametrize('protocol, connections', [('HTTP/1.1', 1), ('HTTP/1.0', 10)])
+def test_stats_count_tcp_connections(server, protocol, connections):
+    server.RequestHandlerClass.protocol_version = protocol
+    session = WeChatSession()
+    url = f'http://127.0.0.1:{server.server_address[1]}/cgi-bin/token?grant_type=client_credential&appid=a&secret=b'
+
+    for _ in range(10):
+        assert 'access_token' in session.get(url).json()
+    stats = session.stats()
+    session.close()
+
+    assert server.accepted == connections
+    assert stats == {'requests': 10, 'connections': connections, 'reused': 10 - connections}
+
+
+def test_mock_server_keeps_connections_alive(server):
+    """模拟接口默认使用 HTTP/1.1 保持连接，JSON、二进制和错误响应都带 Content-Length"""
+    session = WeChatSession()
+    base = f'http://127.0.0.1:{server.server_address[1]}/cgi-bin'
+    token = session.get(f'{base}/token?grant_type=client_credential&appid=a&secret=b').json()['access_token']
+
+    responses = [
+        session.post(f'{base}/material/get_material?access_token={token}', json={'media_id': 'missing'}),
+        session.post(f'{base}/draft/add?access_token=invalid', json={'articles': []}),
+        session.post(f'{base}/freepublish/get?access_token={token}', json={'publish_id': 'missing'}),
+    ]
+    stats = session.stats()
+    session.close()
+
+    assert all('Content-Length' in response.headers for response in responses)
+    assert server.accepted == 1
+    assert stats == {'requests': 4, 'connections': 1, 'reused': 3}